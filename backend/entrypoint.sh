@@ -17,6 +17,7 @@ python manage.py collectstatic --noinput 2>&1 | tail -1
 
 echo "  Setting up data..."
 python create_admin.py 2>&1
+python manage.py clear_abandoned_exams 2>&1 | tail -1
 
 # Setup cloudflared
 CLOUDFLARED="/tmp/cloudflared"
@@ -1,10 +1,13 @@
 from django.contrib import admin
+from django.forms.models import BaseInlineFormSet
+from django.db.models import Count, Q
 from django.utils.html import format_html
 from django.urls import reverse
 from .models import (
     SiteSettings, Teacher, Level, Month, Category, Question,
     VocabularyWord, Student, ExamSession, Answer
 )
+from .queries import active_question_count, score_percentage
 
 
 # ─── Site Settings (singleton) ───
@@ -54,13 +57,17 @@ class TeacherAdmin(admin.ModelAdmin):
     search_fields = ['first_name', 'last_name']
     list_editable = ['is_active']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(num_students=Count('students'))
+
     def student_count_display(self, obj):
-        count = obj.students.count()
+        count = obj.num_students
         if count > 0:
             url = reverse('admin:exams_student_changelist') + f'?teacher__id__exact={obj.id}'
             return format_html('<a href="{}" style="font-weight:bold;color:#002147">{} ta talaba</a>', url, count)
         return '0'
     student_count_display.short_description = "Talabalar soni"
+    student_count_display.admin_order_field = 'num_students'
 
 
 # ─── Level ───
@@ -101,11 +108,16 @@ class LevelAdmin(admin.ModelAdmin):
         )
     color_preview.short_description = 'Color'
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            num_questions=Count('questions', filter=Q(questions__is_active=True)),
+        )
+
     def question_count_display(self, obj):
-        count = obj.questions.filter(is_active=True).count()
         url = reverse('admin:exams_question_changelist') + f'?level__id__exact={obj.id}'
-        return format_html('<a href="{}">{} ta savol</a>', url, count)
+        return format_html('<a href="{}">{} ta savol</a>', url, obj.num_questions)
     question_count_display.short_description = 'Savollar'
+    question_count_display.admin_order_field = 'num_questions'
 
 
 # ─── Month ───
@@ -114,11 +126,15 @@ class MonthAdmin(admin.ModelAdmin):
     list_display = ['__str__', 'level', 'number', 'question_count_display', 'is_active']
     list_filter = ['level', 'is_active']
     list_editable = ['is_active']
+    list_select_related = ['level']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(num_questions=active_question_count())
 
     def question_count_display(self, obj):
-        count = obj.questions.filter(is_active=True).count()
-        return f'{count} ta savol'
+        return f'{obj.num_questions} ta savol'
     question_count_display.short_description = 'Savollar'
+    question_count_display.admin_order_field = 'num_questions'
 
 
 # ─── Category ───
@@ -136,6 +152,7 @@ class QuestionAdmin(admin.ModelAdmin):
     list_filter = ['level', 'month__number', 'category', 'question_type', 'is_active']
     search_fields = ['question_text', 'instructions']
     list_editable = ['is_active', 'points', 'order']
+    list_select_related = ['level', 'month__level', 'category']
     save_as = True
     ordering = ['level__order', 'month__number', 'category__order', 'order']
 
@@ -172,6 +189,7 @@ class VocabularyWordAdmin(admin.ModelAdmin):
     list_filter = ['level', 'month__number', 'is_active']
     search_fields = ['word', 'translation', 'definition']
     list_editable = ['order', 'is_active']
+    list_select_related = ['level', 'month__level']
     ordering = ['level__order', 'month__number', 'order']
 
     fieldsets = (
@@ -194,32 +212,56 @@ class StudentAdmin(admin.ModelAdmin):
     list_display = ['first_name', 'last_name', 'teacher_display', 'exam_count', 'created_at']
     list_filter = ['teacher', 'created_at']
     search_fields = ['first_name', 'last_name', 'teacher__first_name', 'teacher__last_name']
+    list_select_related = ['teacher']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            num_exams=Count('exam_sessions', filter=Q(exam_sessions__is_completed=True)),
+        )
 
     def teacher_display(self, obj):
-        url = reverse('admin:exams_teacher_change', args=[obj.teacher.id])
+        url = reverse('admin:exams_teacher_change', args=[obj.teacher_id])
         return format_html('<a href="{}" style="font-weight:bold">{}</a>', url, obj.teacher.full_name)
     teacher_display.short_description = "O'qituvchi"
+    teacher_display.admin_order_field = 'teacher__last_name'
 
     def exam_count(self, obj):
-        count = obj.exam_sessions.count()
+        count = obj.num_exams
         if count > 0:
-            url = reverse('admin:exams_examsession_changelist') + f'?student__id__exact={obj.id}'
+            url = reverse('admin:exams_examsession_changelist') + f'?student__id__exact={obj.id}&is_completed__exact=1'
             return format_html('<a href="{}">{} ta imtihon</a>', url, count)
         return '0'
     exam_count.short_description = 'Imtihonlar'
+    exam_count.admin_order_field = 'num_exams'
 
 
 # ─── ExamSession with detailed answers ───
+class AnswerFormSet(BaseInlineFormSet):
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        # Every row belongs to the exam on the page; spare Answer.__str__ a query each
+        form.instance.exam_session = self.instance
+        return form
+
+
 class AnswerInline(admin.TabularInline):
+    """View-only answers; the questions and categories come in the same query."""
     model = Answer
+    formset = AnswerFormSet
     extra = 0
     readonly_fields = ['question_display', 'category_display', 'answer_display', 'result_display', 'points_earned']
     fields = ['category_display', 'question_display', 'answer_display', 'result_display', 'points_earned']
     can_delete = False
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('question__category')
+
     def has_add_permission(self, request, obj=None):
         return False
 
+    def has_change_permission(self, request, obj=None):
+        return False
+
     def category_display(self, obj):
         return obj.question.category.name
     category_display.short_description = 'Bo\'lim'
@@ -280,6 +322,8 @@ class ExamSessionAdmin(admin.ModelAdmin):
     readonly_fields = ['session_id', 'started_at', 'total_score', 'max_score', 'certificate_preview']
     inlines = [AnswerInline]
     date_hierarchy = 'started_at'
+    list_select_related = ['student__teacher', 'level', 'month__level']
+    raw_id_fields = ['student']
 
     fieldsets = (
         ('Imtihon ma\'lumotlari', {
@@ -294,13 +338,23 @@ class ExamSessionAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(score_pct=score_percentage())
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'month':
+            # Month labels include the level name
+            kwargs['queryset'] = Month.objects.select_related('level')
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
     def teacher_display(self, obj):
         return obj.student.teacher.full_name
     teacher_display.short_description = "O'qituvchi"
+    teacher_display.admin_order_field = 'student__teacher__last_name'
 
     def score_display(self, obj):
         if obj.max_score > 0:
-            pct = obj.percentage
+            pct = obj.score_pct
             color = '#059669' if pct >= 70 else '#D97706' if pct >= 50 else '#DC2626'
             score_text = f'{obj.total_score:.0f}/{obj.max_score:.0f} ({pct:.1f}%)'
             return format_html(
@@ -309,10 +363,11 @@ class ExamSessionAdmin(admin.ModelAdmin):
             )
         return '-'
     score_display.short_description = 'Ball'
+    score_display.admin_order_field = 'total_score'
 
     def percentage_bar(self, obj):
         if obj.max_score > 0:
-            pct = obj.percentage
+            pct = obj.score_pct
             color = '#059669' if pct >= 70 else '#D97706' if pct >= 50 else '#DC2626'
             return format_html(
                 '<div style="width:100px;height:8px;background:#E2E8F0;border-radius:4px;overflow:hidden">'
@@ -321,6 +376,7 @@ class ExamSessionAdmin(admin.ModelAdmin):
             )
         return '-'
     percentage_bar.short_description = 'Foiz'
+    percentage_bar.admin_order_field = 'score_pct'
 
     def cert_link(self, obj):
         if obj.is_completed:
@@ -356,10 +412,12 @@ class AnswerAdmin(admin.ModelAdmin):
     list_filter = ['is_correct', 'question__category', 'exam_session__level']
     search_fields = ['exam_session__student__first_name', 'question__question_text']
     readonly_fields = ['exam_session', 'question', 'created_at']
+    list_select_related = ['exam_session__student', 'exam_session__level', 'exam_session__month', 'question']
 
     def question_short(self, obj):
         return obj.question.question_text[:60]
     question_short.short_description = 'Savol'
+    question_short.admin_order_field = 'question__question_text'
 
     def answer_preview(self, obj):
         if obj.answer_index is not None:
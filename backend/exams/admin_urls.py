@@ -43,6 +43,9 @@ urlpatterns = [
     path('teachers/', v.teachers_list, name='panel_teachers'),
     path('teachers/<int:pk>/delete/', v.teacher_delete, name='panel_teacher_delete'),
 
+    # Reports
+    path('reports/', v.reports, name='panel_reports'),
+
     # Months
     path('months/', v.months_list, name='panel_months'),
     path('months/add/', v.month_edit, name='panel_month_add'),
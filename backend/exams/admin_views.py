@@ -3,13 +3,24 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db.models import Count, Q
 from django.http import JsonResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from .models import (
     SiteSettings, Teacher, Level, Month, Category, Question,
-    VocabularyWord, Student, ExamSession, Answer
+    VocabularyWord, Student, ExamSession, Answer, QuestionStats
 )
+from .ai_cache import detection_cache
+from .ai_verdicts import refresh_ai_verdicts
+from .catalogue import edit_options, site_settings as cached_site_settings, teacher_options
+from .dashboard import dashboard_stats
+from .queries import active_question_count, score_percentage
+from .reports import report_for, report_params
+from .pagination import PAGE_SIZES, keyset_page, numbered_page, page_links, page_size, page_url
 import json
+from datetime import datetime, time, timedelta
 
 staff_required = user_passes_test(lambda u: u.is_staff)
 
@@ -37,28 +48,23 @@ def admin_logout(request):
 @login_required(login_url='/admin/login/')
 @staff_required
 def dashboard(request):
-    ctx = {
-        'total_questions': Question.objects.filter(is_active=True).count(),
-        'total_categories': Category.objects.filter(is_active=True).count(),
-        'total_exams': ExamSession.objects.count(),
-        'total_students': Student.objects.count(),
-        'total_teachers': Teacher.objects.count(),
-        'total_levels': Level.objects.filter(is_active=True).count(),
-        'recent_exams': ExamSession.objects.select_related(
-            'student', 'level', 'month'
-        ).order_by('-started_at')[:10],
-    }
-    return render(request, 'panel/dashboard.html', ctx)
+    # Detection cache counters are per process, so they are read live, not cached
+    return render(request, 'panel/dashboard.html', {
+        **dashboard_stats(),
+        'ai_cache': detection_cache.stats(),
+    })
 
 
 # ── Site Settings ──
 @login_required(login_url='/admin/login/')
 @staff_required
 def site_settings(request):
-    settings_obj = SiteSettings.load()
+    settings_obj = cached_site_settings()
     saved = False
 
     if request.method == 'POST':
+        # The cached object is shared; edit a fresh copy
+        settings_obj = SiteSettings.load()
         settings_obj.site_name = request.POST.get('site_name', settings_obj.site_name)
         settings_obj.tagline = request.POST.get('tagline', settings_obj.tagline)
 
@@ -94,8 +100,11 @@ def site_settings(request):
 @login_required(login_url='/admin/login/')
 @staff_required
 def levels_list(request):
-    levels = Level.objects.order_by('order')
-    return render(request, 'panel/levels.html', {'levels': levels})
+    levels = Level.objects.annotate(
+        num_questions=Count('questions', filter=Q(questions__is_active=True)),
+    ).order_by('order', 'pk')
+    page, pager = numbered_page(levels, request, {'size': page_size(request)})
+    return render(request, 'panel/levels.html', {'levels': page, **pager})
 
 
 @login_required(login_url='/admin/login/')
@@ -150,23 +159,72 @@ def level_delete(request, pk):
 
 
 # ── Questions ──
+QUESTION_SORTS = {
+    'p': ('p_value', 'question_id'),
+    '-p': ('-p_value', 'question_id'),
+}
+
+
 @login_required(login_url='/admin/login/')
 @staff_required
 def questions_list(request):
-    cat_filter = request.GET.get('category', '')
-    level_filter = request.GET.get('level', '')
-    qs = Question.objects.select_related('category', 'level', 'month').order_by(
-        'level__order', 'month__number', 'category__order', 'order', 'id'
-    )
-    if cat_filter:
-        qs = qs.filter(category__slug=cat_filter)
-    if level_filter:
-        qs = qs.filter(level__slug=level_filter)
-    categories = Category.objects.order_by('order')
-    levels = Level.objects.order_by('order')
+    params = {
+        'q': request.GET.get('q', '').strip(),
+        'type': request.GET.get('type', ''),
+        'level': request.GET.get('level', ''),
+        'month': request.GET.get('month', ''),
+        'category': request.GET.get('category', ''),
+        'sort': request.GET.get('sort', ''),
+        'size': page_size(request),
+    }
+    options = edit_options()
+    qs = Question.objects.order_by('-pk')
+
+    # Every word has to appear in the text or the instructions
+    for word in params['q'].split()[:5]:
+        qs = qs.filter(Q(question_text__icontains=word) | Q(instructions__icontains=word))
+    if params['type'] in dict(Question.QUESTION_TYPES):
+        qs = qs.filter(question_type=params['type'])
+    level = next((lv for lv in options['levels'] if lv['slug'] == params['level']), None)
+    months = []
+    if level:
+        qs = qs.filter(level_id=level['pk'])
+        months = [m for m in options['months'] if m['level_id'] == level['pk']]
+        month = next((m for m in months if str(m['number']) == params['month']), None)
+        if month:
+            # One month is listed in exam order, everything else newest first
+            qs = qs.filter(month_id=month['pk']).order_by('category__order', 'order', 'pk')
+    category = next((c for c in options['categories'] if c['slug'] == params['category']), None)
+    if category:
+        qs = qs.filter(category_id=category['pk'])
+
+    ids = qs.values_list('pk', flat=True)
+    if params['sort'] in QUESTION_SORTS:
+        # Walk the p-value index and keep the questions that pass the filters.
+        # Questions nobody answered yet have no p-value to sort by.
+        ids = QuestionStats.objects.filter(p_value__isnull=False).order_by(
+            *QUESTION_SORTS[params['sort']]
+        ).values_list('question_id', flat=True)
+        if qs.query.where:
+            ids = ids.filter(question__in=qs.values('pk'))
+
+    # Page through ids only, then load the rows of this page
+    page = Paginator(ids, params['size']).get_page(request.GET.get('page'))
+    rows = Question.objects.select_related('category', 'level', 'month', 'stats').defer(
+        'options', 'correct_answer', 'instructions',
+    ).in_bulk(list(page))
+    page.object_list = [rows[pk] for pk in page.object_list]
     return render(request, 'panel/questions.html', {
-        'questions': qs, 'categories': categories,
-        'levels': levels, 'current_cat': cat_filter, 'current_level': level_filter,
+        'questions': page,
+        'levels': options['levels'],
+        'months': months,
+        'categories': options['categories'],
+        'question_types': Question.QUESTION_TYPES,
+        'sorts': [('p', 'Eng qiyin (p ↑)'), ('-p', 'Eng oson (p ↓)')],
+        'params': params,
+        'page_sizes': PAGE_SIZES,
+        'page': page,
+        **page_links(page, params),
     })
 
 
@@ -174,9 +232,6 @@ def questions_list(request):
 @staff_required
 def question_edit(request, pk=None):
     question = get_object_or_404(Question, pk=pk) if pk else None
-    categories = Category.objects.order_by('order')
-    levels = Level.objects.order_by('order')
-    months = Month.objects.order_by('level__order', 'number')
 
     if request.method == 'POST':
         cat_id = request.POST.get('category')
@@ -221,9 +276,10 @@ def question_edit(request, pk=None):
 
         return redirect('/admin/questions/')
 
+    options = edit_options()
     return render(request, 'panel/question_form.html', {
-        'question': question, 'categories': categories,
-        'levels': levels, 'months': months,
+        'question': question, 'categories': options['categories'],
+        'levels': options['levels'], 'months': options['months'],
     })
 
 
@@ -273,22 +329,74 @@ def category_delete(request, pk):
 
 
 # ── Exams ──
+def day_start(value):
+    """Midnight (current time zone) of a YYYY-MM-DD string, or None."""
+    try:
+        day = parse_date(value)
+    except ValueError:
+        return None
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
 @login_required(login_url='/admin/login/')
 @staff_required
 def exams_list(request):
-    exams = ExamSession.objects.select_related(
+    params = {
+        'level': request.GET.get('level', ''),
+        'month': request.GET.get('month', ''),
+        'teacher': request.GET.get('teacher', ''),
+        'date_from': request.GET.get('date_from', ''),
+        'date_to': request.GET.get('date_to', ''),
+        'size': page_size(request),
+    }
+    # Exams still being taken, or abandoned, are not results yet
+    exams = ExamSession.objects.filter(is_completed=True).select_related(
         'student', 'student__teacher', 'level', 'month'
-    ).order_by('-started_at')
-    return render(request, 'panel/exams.html', {'exams': exams})
+    ).annotate(score_pct=score_percentage())
+
+    levels = list(Level.objects.order_by('order'))
+    level = next((lv for lv in levels if lv.slug == params['level']), None)
+    months = []
+    if level:
+        exams = exams.filter(level=level)
+        months = list(Month.objects.filter(level=level).order_by('number'))
+        # Filter on month_id next to level_id, which exam_level_month_idx covers
+        month = next((m for m in months if str(m.number) == params['month']), None)
+        if month:
+            exams = exams.filter(month=month)
+    if params['teacher'].isdigit():
+        exams = exams.filter(student__teacher_id=int(params['teacher']))
+    # A started_at range rather than __date, so the index still applies
+    date_from = day_start(params['date_from'])
+    if date_from:
+        exams = exams.filter(started_at__gte=date_from)
+    date_to = day_start(params['date_to'])
+    if date_to:
+        exams = exams.filter(started_at__lt=date_to + timedelta(days=1))
+
+    page = keyset_page(exams, request, 'started_at', params['size'])
+    return render(request, 'panel/exams.html', {
+        'exams': page,
+        'levels': levels,
+        'months': months,
+        'teachers': teacher_options(),
+        'params': params,
+        'page_sizes': PAGE_SIZES,
+        'next_url': page_url(params, after=page.next_cursor) if page.has_next else '',
+        'prev_url': page_url(params, before=page.prev_cursor) if page.has_prev else '',
+    })
 
 
 @login_required(login_url='/admin/login/')
 @staff_required
 def exam_detail(request, pk):
     exam = get_object_or_404(ExamSession, pk=pk)
-    answers = exam.answers.select_related(
+    answers = list(exam.answers.select_related(
         'question', 'question__category'
-    ).order_by('question__category__order', 'question__order')
+    ).order_by('question__category__order', 'question__order'))
+    refresh_ai_verdicts(answers)
     return render(request, 'panel/exam_detail.html', {'exam': exam, 'answers': answers})
 
 
@@ -304,12 +412,11 @@ def exam_delete(request, pk):
 @login_required(login_url='/admin/login/')
 @staff_required
 def students_list(request):
-    students = Student.objects.select_related('teacher').order_by('-created_at')
-    student_data = []
-    for s in students:
-        exam_count = s.exam_sessions.count()
-        student_data.append({'student': s, 'exam_count': exam_count})
-    return render(request, 'panel/students.html', {'students': student_data})
+    students = Student.objects.select_related('teacher').annotate(
+        num_exams=Count('exam_sessions', filter=Q(exam_sessions__is_completed=True)),
+    ).order_by('-created_at', '-pk')
+    page, pager = numbered_page(students, request, {'size': page_size(request)})
+    return render(request, 'panel/students.html', {'students': page, **pager})
 
 
 @login_required(login_url='/admin/login/')
@@ -324,12 +431,11 @@ def student_delete(request, pk):
 @login_required(login_url='/admin/login/')
 @staff_required
 def teachers_list(request):
-    teachers = Teacher.objects.order_by('last_name', 'first_name')
-    teacher_data = []
-    for t in teachers:
-        student_count = t.students.count()
-        teacher_data.append({'teacher': t, 'student_count': student_count})
-    return render(request, 'panel/teachers.html', {'teachers': teacher_data})
+    teachers = Teacher.objects.annotate(
+        num_students=Count('students'),
+    ).order_by('last_name', 'first_name', 'pk')
+    page, pager = numbered_page(teachers, request, {'size': page_size(request)})
+    return render(request, 'panel/teachers.html', {'teachers': page, **pager})
 
 
 @login_required(login_url='/admin/login/')
@@ -340,12 +446,32 @@ def teacher_delete(request, pk):
     return redirect('/admin/teachers/')
 
 
+# ── Reports ──
+@login_required(login_url='/admin/login/')
+@staff_required
+def reports(request):
+    params = report_params(request.GET)
+    categories, rows = report_for(params)
+    options = edit_options()
+    return render(request, 'panel/reports.html', {
+        'categories': categories,
+        'rows': rows,
+        'params': params,
+        'levels': options['levels'],
+        'months': options['months'],
+        'teachers': teacher_options(),
+    })
+
+
 # ── Months ──
 @login_required(login_url='/admin/login/')
 @staff_required
 def months_list(request):
-    months = Month.objects.select_related('level').order_by('level__order', 'number')
-    return render(request, 'panel/months.html', {'months': months})
+    months = Month.objects.select_related('level').annotate(
+        num_questions=active_question_count(),
+    ).order_by('level__order', 'number', 'pk')
+    page, pager = numbered_page(months, request, {'size': page_size(request)})
+    return render(request, 'panel/months.html', {'months': page, **pager})
 
 
 @login_required(login_url='/admin/login/')
@@ -0,0 +1,172 @@
+"""
+Content-hash LRU cache for AI detection results.
+The same essay is checked while typing, again on submit and again when staff
+review it, so results are cached by a hash of the text and shared by
+detect_ai_text and AdvancedAIDetector.detect.
+
+Configured through settings.AI_DETECTION_CACHE:
+    BACKEND  'local' (per-process LRU) or 'django' (a Django cache alias,
+             e.g. file-based so every gunicorn worker shares hits)
+    ALIAS    Django cache alias used by the 'django' backend
+    SIZE     max entries kept by the 'local' backend
+    TTL      seconds an entry stays valid (0 or None = no expiry)
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+
+DEFAULTS = {
+    'BACKEND': 'local',
+    'ALIAS': 'default',
+    'SIZE': 2048,
+    'TTL': 3600,
+}
+
+
+def text_key(namespace: str, text: str) -> str:
+    """
+    Cache key for a text. Both detectors are sensitive to case, whitespace and
+    line breaks, so the only normalisation that keeps scores identical is the
+    text itself; it is hashed so keys stay short.
+    """
+    digest = hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+    return f'ai-detect:{namespace}:{digest}'
+
+
+class LocalLRU:
+    """Thread-safe in-process LRU with per-entry expiry."""
+
+    def __init__(self, size: int, ttl: Optional[float]):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            # Callers own their result; keep the cached copy pristine
+            return copy.deepcopy(value)
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            self.entries[key] = (expires, copy.deepcopy(value))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class DjangoCacheBackend:
+    """Stores entries in a Django cache alias (locmem, file-based, ...)."""
+
+    def __init__(self, alias: str, ttl: Optional[float]):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+        self.ttl = ttl or None
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, timeout=self.ttl)
+
+    def clear(self):
+        # Entries expire on their own; a shared alias must not be wiped here
+        pass
+
+
+class DetectionCache:
+    """
+    Caches detection results by text hash and counts hits and misses.
+    The backend is built from settings on first use.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = config
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_backend(self):
+        if self.backend is None:
+            config = dict(DEFAULTS)
+            if self.config is not None:
+                config.update(self.config)
+            else:
+                from django.conf import settings
+                from django.core.exceptions import ImproperlyConfigured
+                try:
+                    config.update(getattr(settings, 'AI_DETECTION_CACHE', {}))
+                except ImproperlyConfigured:
+                    pass  # Used outside Django: keep the defaults
+            if config['BACKEND'] == 'django':
+                self.backend = DjangoCacheBackend(config['ALIAS'], config['TTL'])
+            else:
+                self.backend = LocalLRU(config['SIZE'], config['TTL'])
+        return self.backend
+
+    def get_or_compute(self, namespace: str, text: str, compute: Callable[[], Dict]) -> Dict:
+        backend = self.get_backend()
+        key = text_key(namespace, text)
+        result = backend.get(key)
+        if result is not None:
+            with self.lock:
+                self.hits += 1
+            return result
+        with self.lock:
+            self.misses += 1
+        result = compute()
+        backend.set(key, result)
+        return result
+
+    def stats(self) -> Dict:
+        """Hit/miss counters of this process; size is only known for the local LRU."""
+        backend = self.get_backend()
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'size': len(backend) if isinstance(backend, LocalLRU) else None,
+        }
+
+    def clear(self):
+        self.get_backend().clear()
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+    def cached(self, namespace: str):
+        """Decorator caching a text -> result function under namespace."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(text, *args, **kwargs):
+                if not isinstance(text, str) or args or kwargs:
+                    return func(text, *args, **kwargs)
+                return self.get_or_compute(namespace, text, lambda: func(text))
+            return wrapper
+        return decorator
+
+
+detection_cache = DetectionCache()
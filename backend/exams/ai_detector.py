@@ -3,8 +3,457 @@ Advanced AI Detection Module for Django
 Detects AI-generated, copied, or translated content
 """
 import re
+import math
 import statistics
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, NamedTuple
+from .ai_cache import detection_cache
+
+
+# Bump whenever detect_ai_text can score a text differently; stored verdicts
+# and cached results from older versions are then recomputed.
+DETECTOR_VERSION = 1
+CACHE_NAMESPACE = f'phrases-v{DETECTOR_VERSION}'
+# The same for AdvancedAIDetector.detect
+ADVANCED_DETECTOR_VERSION = 1
+ADVANCED_CACHE_NAMESPACE = f'advanced-v{ADVANCED_DETECTOR_VERSION}'
+
+AI_PHRASES = [
+    'it is important to note', 'it is worth noting', 'in conclusion',
+    'furthermore', 'moreover', 'additionally', 'in today\'s world',
+    'in today\'s society', 'plays a crucial role', 'plays a vital role',
+    'it is essential to', 'on the other hand', 'in summary',
+    'as a result', 'consequently', 'nevertheless', 'nonetheless',
+    'in light of', 'with regard to', 'in terms of',
+    'it can be argued', 'one could argue', 'it goes without saying',
+    'last but not least', 'to sum up', 'all in all',
+    'taking everything into consideration', 'from my perspective',
+    'in my opinion', 'first and foremost', 'significantly',
+    'fundamentally', 'transforming how', 'rapidly shaping',
+    'undeniably', 'indispensable', 'paramount', 'multifaceted',
+    'delve into', 'tapestry', 'landscape of',
+    'navigating the', 'ever-evolving', 'harness the power',
+    'pave the way', 'shed light on', 'foster a sense of',
+    'a testament to', 'serves as a', 'it is imperative',
+    'encompasses a wide range', 'strikes a balance',
+    'holistic approach', 'nuanced understanding',
+    'artificial intelligence is rapidly', 'the future of humanity',
+    'from healthcare to education', 'transforming how people',
+    'intelligent machines', 'reshaping the way',
+    'revolutionizing', 'pivotal role', 'profound impact',
+]
+
+AI_PHRASES_UZ = [
+    'shuni ta\'kidlash kerak', 'bugungi kunda', 'xulosa qilib aytganda',
+    'bundan tashqari', 'shuningdek', 'qo\'shimcha ravishda',
+    'zamonaviy dunyoda', 'muhim rol o\'ynaydi', 'hal qiluvchi ahamiyatga ega',
+    'boshqa tomondan', 'natijada', 'shunga qaramay',
+    'fikrimcha', 'eng avvalo', 'sezilarli darajada',
+    'o\'z navbatida', 'shubhasiz', 'ta\'kidlash joiz',
+    'yakunlab aytganda', 'umuman olganda',
+]
+
+TRANSITIONS = [
+    'however', 'moreover', 'furthermore', 'additionally',
+    'consequently', 'nevertheless', 'therefore', 'thus',
+    'hence', 'meanwhile', 'subsequently', 'accordingly',
+    'biroq', 'shuningdek', 'bundan tashqari', 'natijada',
+    'shuning uchun', 'demak', 'binobarin',
+]
+
+
+def _trie_regex(trie: Dict) -> str:
+    """Render a character trie as a regex that prefers the longest phrase."""
+    branches = [re.escape(ch) + _trie_regex(child) for ch, child in sorted(trie.items()) if ch]
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in trie:
+        return '(?:' + body + ')?'
+    return body
+
+
+# Up to about this many phrases, testing each with `in` (a C substring
+# search) beats the trie regex, whose per-character cost is higher
+SUBSTRING_SCAN_LIMIT = 150
+
+
+class PhraseMatcher:
+    """
+    Counts substring hits for several named phrase lists in a single scan.
+    Short lists are scanned phrase by phrase. Longer ones are compiled once
+    into one trie-shaped regex, so a scan costs O(text length) regardless
+    of how many phrases the lists hold.
+    """
+
+    def __init__(self, groups: Dict[str, List[str]]):
+        self.groups = {name: list(phrases) for name, phrases in groups.items()}
+        phrases = {p for group in self.groups.values() for p in group}
+        self.phrases = tuple(sorted(phrases))
+        self.regex = None
+        if len(phrases) <= SUBSTRING_SCAN_LIMIT:
+            return
+
+        trie = {}
+        for phrase in phrases:
+            node = trie
+            for ch in phrase:
+                node = node.setdefault(ch, {})
+            node[''] = {}
+        self.regex = re.compile(_trie_regex(trie))
+
+        # The regex reports the longest phrase starting at a position; every
+        # shorter phrase that is a prefix of it matched there too.
+        self.prefixes = {
+            longest: frozenset(p for p in phrases if longest.startswith(p))
+            for longest in phrases
+        }
+
+    def find(self, text: str) -> set:
+        """Return the distinct phrases occurring anywhere in text."""
+        if self.regex is None:
+            return {p for p in self.phrases if p in text}
+        found = set()
+        search = self.regex.search
+        m = search(text)
+        while m is not None:
+            found |= self.prefixes[m.group()]
+            # Resume one character later so overlapping phrases are seen too
+            m = search(text, m.start() + 1)
+        return found
+
+    def count(self, text: str) -> Dict[str, int]:
+        """Return, per group, how many of its phrases occur in text."""
+        return self.count_found(self.find(text))
+
+    def count_found(self, found: set) -> Dict[str, int]:
+        """Return, per group, how many of its phrases are in found."""
+        return {
+            name: sum(1 for p in phrases if p in found)
+            for name, phrases in self.groups.items()
+        }
+
+
+PHRASE_MATCHER = PhraseMatcher({
+    'ai': AI_PHRASES + AI_PHRASES_UZ,
+    'transitions': TRANSITIONS,
+})
+
+
+SENTENCE_SPLIT = re.compile(r'[.!?]+')
+
+CASUAL_MARKERS = {'ok', 'yeah', 'gonna', 'wanna', 'kinda', 'ya', 'lol', 'btw'}
+
+LATIN_WORD = re.compile(r'[a-zA-Z]+')
+
+LIST_ITEM = re.compile(r'(?:^|\n)\s*(?:\d+[\.\)]\s|[a-z][\.\)]\s|[-•]\s)')
+
+
+class Spread(NamedTuple):
+    """Count, sum and sum of squares of some lengths."""
+    count: int
+    total: int
+    total_sq: int
+
+    def plus(self, other, sign: int = 1) -> 'Spread':
+        """This spread with other's lengths added, or with sign=-1 taken out."""
+        return Spread(self.count + sign * other[0], self.total + sign * other[1], self.total_sq + sign * other[2])
+
+    def cv(self) -> float:
+        """Coefficient of variation, from integer sums so every caller gets the same float."""
+        if self.total <= 0:
+            return 0
+        return math.sqrt(max(self.count * self.total_sq - self.total * self.total, 0)) / self.total
+
+
+def spread(lengths) -> Spread:
+    """Spread of an iterable of lengths."""
+    count = total = total_sq = 0
+    for n in lengths:
+        count += 1
+        total += n
+        total_sq += n * n
+    return Spread(count, total, total_sq)
+
+
+class TextFeatures(NamedTuple):
+    """Everything detect_ai_text scores a text on."""
+    word_count: int
+    phrase_hits: int
+    transitions: int
+    sentences: Spread  # word counts of sentences longer than 5 characters
+    paragraphs: Spread  # word counts of lines longer than 20 characters
+    long_words: int  # distinct latin words longer than 10 letters
+    quotes: int
+    casual_markers: int
+    list_items: int
+
+
+@detection_cache.cached(CACHE_NAMESPACE)
+def detect_ai_text(text):
+    if not text or len(text.strip()) < 30:
+        return {'is_ai': False, 'score': 0, 'reasons': []}
+
+    text_lower = text.lower().strip()
+    words = text_lower.split()
+    if len(words) < 10:
+        return {'is_ai': False, 'score': 0, 'reasons': []}
+
+    hits = PHRASE_MATCHER.count(text_lower)
+    sentences = [s.strip() for s in SENTENCE_SPLIT.split(text_lower)]
+    paragraphs = [p.strip() for p in text.split('\n')]
+    return score_features(TextFeatures(
+        word_count=len(words),
+        phrase_hits=hits['ai'],
+        transitions=hits['transitions'],
+        sentences=spread(len(s.split()) for s in sentences if len(s) > 5),
+        paragraphs=spread(len(p.split()) for p in paragraphs if len(p) > 20),
+        long_words=sum(1 for w in set(LATIN_WORD.findall(text_lower)) if len(w) > 10),
+        quotes=text.count("'"),
+        casual_markers=sum(1 for w in words if w in CASUAL_MARKERS),
+        list_items=len(LIST_ITEM.findall(text)),
+    ))
+
+
+def score_features(f: TextFeatures) -> Dict:
+    """Score a text from its features; detect_ai_text and live drafts share this."""
+    if f.word_count < 10:
+        return {'is_ai': False, 'score': 0, 'reasons': []}
+
+    score = 0
+    reasons = []
+
+    # 1. Check AI-typical phrases (EN + UZ)
+    phrase_hits = f.phrase_hits
+    if phrase_hits >= 3:
+        score += 35
+        reasons.append(f'{phrase_hits} ta AI-tipik ibora topildi')
+    elif phrase_hits >= 2:
+        score += 20
+        reasons.append(f'{phrase_hits} ta AI-tipik ibora topildi')
+    elif phrase_hits >= 1:
+        score += 8
+
+    # 2. Sentence uniformity (AI writes very uniform sentence lengths)
+    sentences = f.sentences
+    if sentences.count >= 3:
+        avg_len = sentences.total / sentences.count
+        cv = sentences.cv()
+        if cv < 0.25 and avg_len > 8:
+            score += 20
+            reasons.append('Gaplar uzunligi juda bir xil (AI belgisi)')
+        elif cv < 0.35 and avg_len > 10:
+            score += 10
+
+    # 3. Excessive transition words
+    trans_count = f.transitions
+    trans_ratio = trans_count / max(sentences.count, 1)
+    if trans_ratio > 0.5 and trans_count >= 3:
+        score += 15
+        reasons.append(f"{trans_count} ta bog'lovchi so'z (ko'p)")
+    elif trans_ratio > 0.3 and trans_count >= 2:
+        score += 8
+
+    # 4. Paragraph structure too perfect (similar paragraph lengths)
+    if f.paragraphs.count >= 3 and f.paragraphs.cv() < 0.2:
+        score += 15
+        reasons.append('Paragraflar uzunligi juda bir xil')
+
+    # 5. High vocabulary diversity with long words (AI uses complex vocab)
+    if f.long_words > f.word_count * 0.08 and f.word_count > 30:
+        score += 12
+        reasons.append(f"{f.long_words} ta murakkab so'z ishlatilgan")
+
+    # 6. Too few spelling/grammar mistakes (humans make errors)
+    if f.word_count > 50 and f.quotes == 0 and f.casual_markers == 0:
+        score += 8
+
+    # 7. Numbered/lettered list patterns (AI loves lists)
+    if f.list_items >= 3 and f.word_count > 40:
+        score += 10
+        reasons.append(f"{f.list_items} ta ro'yxat element topildi")
+
+    score = min(score, 100)
+    is_ai = score >= 40
+
+    return {
+        'is_ai': is_ai,
+        'score': score,
+        'reasons': reasons,
+        'label': 'AI yozgan' if score >= 70 else 'AI ishlatilgan bo\'lishi mumkin' if score >= 40 else 'Inson yozgan',
+    }
+
+
+# Patterns run case-sensitively on lowered text. These are the only lowered
+# characters re.IGNORECASE would still equate with an ASCII letter.
+IGNORECASE_EXTRAS = str.maketrans({'\u0131': 'i', '\u017f': 's'})
+
+WORD_BOUNDARY = re.compile(r'\b')
+
+AI_SIGNATURES = [
+    'as an ai language model',
+    'i am an ai',
+    'i cannot',
+    'i don\'t have',
+    'i\'m designed to',
+]
+
+
+def _mean(values: List[int]):
+    """statistics.mean for ints without the Fraction arithmetic."""
+    total = sum(values)
+    quotient, remainder = divmod(total, len(values))
+    return quotient if remainder == 0 else total / len(values)
+
+
+class CompiledPattern:
+    """
+    A detector regex compiled once. A leading \\b is stripped and checked by
+    hand on each candidate, which lets re use its fast first-character scan;
+    matches are the same as for the original pattern.
+    """
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.leading_boundary = pattern.startswith(r'\b')
+        self.regex = re.compile(pattern[2:] if self.leading_boundary else pattern)
+
+    def finditer(self, text: str):
+        if not self.leading_boundary:
+            yield from self.regex.finditer(text)
+            return
+        search = self.regex.search
+        m = search(text)
+        while m is not None:
+            start, end = m.span()
+            if WORD_BOUNDARY.match(text, start):
+                yield m
+                m = search(text, end if end > start else start + 1)
+            else:
+                m = search(text, start + 1)
+
+    def search(self, text: str):
+        return next(self.finditer(text), None)
+
+    def count(self, text: str) -> int:
+        return sum(1 for _ in self.finditer(text))
+
+
+class TextAnalysis:
+    """
+    Single-pass view of one text shared by every AdvancedAIDetector sub-score.
+    The text is lowered, tokenized and split into sentences once, and each
+    precompiled pattern runs once; the detector only combines the results.
+    """
+
+    def __init__(self, detector: 'AdvancedAIDetector', text: str):
+        self.text = text
+        text_lower = text.lower()
+        self.text_lower = text_lower
+        pattern_text = text_lower
+        if '\u0131' in text_lower or '\u017f' in text_lower:
+            pattern_text = text_lower.translate(IGNORECASE_EXTRAS)
+
+        raw_sentences = SENTENCE_SPLIT.split(text)
+        sentences = [s.strip() for s in raw_sentences if s.strip()]
+        words = text.split()
+        sentence_lengths = [len(s.split()) for s in sentences]
+        sentence_std = statistics.pstdev(sentence_lengths) if sentence_lengths else 0
+
+        # Statistical features
+        if sentences:
+            self.statistics = {
+                'avg_word_length': _mean([len(w) for w in words]) if words else 0,
+                'avg_sentence_length': _mean(sentence_lengths),
+                'sentence_length_std': sentence_std if len(sentence_lengths) > 1 else 0,
+                'total_sentences': len(sentences),
+                'total_words': len(words),
+                'unique_words_ratio': len(set(words)) / len(words) if words else 0
+            }
+        else:
+            self.statistics = {}
+
+        # Translation markers; very consistent sentence structure suggests AI translation
+        self.translation_patterns = [
+            'TRANSLATION_TOOL' for rx in detector.translation_marker_res if rx.search(pattern_text)
+        ]
+        if len(text) > 100 and len(raw_sentences) > 3 and sentence_lengths:
+            if sentence_std < 10:
+                self.translation_patterns.append('PERFECT_TRANSLATION')
+
+        # Copy markers and AI signatures
+        self.copy_patterns = [
+            'COPY_MARKER' for rx in detector.copy_marker_res if rx.search(pattern_text)
+        ]
+        self.copy_patterns += ['AI_SIGNATURE' for sig in AI_SIGNATURES if sig in text_lower]
+
+        # AI indicator phrases and vocabulary
+        self.pattern_matches = 0
+        self.detected_patterns = []
+        for rx in detector.ai_phrase_res:
+            found = rx.count(pattern_text)
+            if found:
+                self.pattern_matches += found
+                self.detected_patterns.append('AI_PHRASE')
+
+        sophisticated_count = sum(1 for word in detector.sophisticated_vocab if word in text_lower)
+        if sophisticated_count >= 3:
+            self.pattern_matches += 2
+            self.detected_patterns.append('SOPHISTICATED_VOCAB')
+
+        transition_count = sum(1 for word in detector.transition_words if word in text_lower)
+        if transition_count >= 5:
+            self.pattern_matches += 1
+            self.detected_patterns.append('EXCESSIVE_TRANSITIONS')
+
+    @property
+    def is_translated(self) -> bool:
+        return len(self.translation_patterns) > 0
+
+    @property
+    def is_copied(self) -> bool:
+        return len(self.copy_patterns) > 0
+
+    @property
+    def confidence(self) -> float:
+        """Confidence score (0-1) that the text is AI-generated/copied/translated"""
+        confidence = 0.0
+
+        # Check for translation markers (high confidence)
+        if self.is_translated:
+            confidence += 0.6
+            if 'PERFECT_TRANSLATION' in self.translation_patterns:
+                confidence += 0.2
+
+        # Check for copy markers (very high confidence)
+        if self.is_copied:
+            confidence += 0.7
+            if 'AI_SIGNATURE' in self.copy_patterns:
+                confidence = 1.0  # Definite AI
+
+        # Pattern detection
+        if self.pattern_matches >= 5:
+            confidence += 0.3
+        elif self.pattern_matches >= 3:
+            confidence += 0.2
+        elif self.pattern_matches >= 2:
+            confidence += 0.1
+
+        stats = self.statistics
+
+        # Very consistent sentence length (AI characteristic)
+        if stats.get('sentence_length_std', 100) < 12 and stats.get('total_sentences', 0) > 3:
+            confidence += 0.15
+
+        # High average sentence length (AI often writes longer sentences)
+        if stats.get('avg_sentence_length', 0) > 20:
+            confidence += 0.1
+
+        # Check for explicit AI markers
+        text_lower = self.text_lower
+        if '[ai enhanced' in text_lower or '[ai assisted' in text_lower or 'chatgpt' in text_lower:
+            confidence = 1.0
+
+        return min(confidence, 1.0)
 
 
 class AdvancedAIDetector:
@@ -54,101 +503,34 @@ class AdvancedAIDetector:
             'furthermore', 'moreover', 'additionally', 'consequently',
             'therefore', 'thus', 'hence', 'accordingly', 'subsequently'
         ]
+
+        # Compiled once; TextAnalysis runs them on lowered text, see IGNORECASE_EXTRAS
+        self.ai_phrase_res = [CompiledPattern(p) for p in self.ai_phrases]
+        self.translation_marker_res = [CompiledPattern(p) for p in self.translation_markers]
+        self.copy_marker_res = [CompiledPattern(p) for p in self.copy_markers]
+
+    def analyze(self, text: str) -> TextAnalysis:
+        """Run the shared single-pass analysis every sub-score is derived from"""
+        return TextAnalysis(self, text)
     
     def analyze_text_statistics(self, text: str) -> Dict:
         """Analyze statistical features of text"""
-        sentences = re.split(r'[.!?]+', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        if not sentences:
-            return {}
-        
-        words = text.split()
-        word_lengths = [len(w) for w in words]
-        sentence_lengths = [len(s.split()) for s in sentences]
-        
-        stats = {
-            'avg_word_length': statistics.mean(word_lengths) if word_lengths else 0,
-            'avg_sentence_length': statistics.mean(sentence_lengths) if sentence_lengths else 0,
-            'sentence_length_std': statistics.pstdev(sentence_lengths) if len(sentence_lengths) > 1 else 0,
-            'total_sentences': len(sentences),
-            'total_words': len(words),
-            'unique_words_ratio': len(set(words)) / len(words) if words else 0
-        }
-        
-        return stats
+        return self.analyze(text).statistics
     
     def detect_translation(self, text: str) -> Tuple[bool, List[str]]:
         """Detect if text was translated using AI tools"""
-        text_lower = text.lower()
-        detected = []
-        
-        for pattern in self.translation_markers:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                detected.append('TRANSLATION_TOOL')
-        
-        # Check for perfect grammar in translation (often AI)
-        if len(text) > 100:
-            # Very consistent sentence structure suggests AI translation
-            sentences = re.split(r'[.!?]+', text)
-            if len(sentences) > 3:
-                lengths = [len(s.split()) for s in sentences if s.strip()]
-                if lengths:
-                    std_dev = statistics.pstdev(lengths)
-                    if std_dev < 10:  # Very consistent
-                        detected.append('PERFECT_TRANSLATION')
-        
-        return len(detected) > 0, detected
+        analysis = self.analyze(text)
+        return analysis.is_translated, analysis.translation_patterns
     
     def detect_copy(self, text: str) -> Tuple[bool, List[str]]:
         """Detect if text was copied from AI"""
-        text_lower = text.lower()
-        detected = []
-        
-        for pattern in self.copy_markers:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                detected.append('COPY_MARKER')
-        
-        # Check for AI signature patterns
-        ai_signatures = [
-            'as an ai language model',
-            'i am an ai',
-            'i cannot',
-            'i don\'t have',
-            'i\'m designed to',
-        ]
-        
-        for sig in ai_signatures:
-            if sig in text_lower:
-                detected.append('AI_SIGNATURE')
-        
-        return len(detected) > 0, detected
+        analysis = self.analyze(text)
+        return analysis.is_copied, analysis.copy_patterns
     
     def detect_patterns(self, text: str) -> Tuple[int, List[str]]:
         """Detect AI indicator patterns"""
-        text_lower = text.lower()
-        matches = 0
-        detected_patterns = []
-        
-        for pattern in self.ai_phrases:
-            found = re.findall(pattern, text_lower, re.IGNORECASE)
-            if found:
-                matches += len(found)
-                detected_patterns.append('AI_PHRASE')
-        
-        # Check for sophisticated vocabulary
-        sophisticated_count = sum(1 for word in self.sophisticated_vocab if word in text_lower)
-        if sophisticated_count >= 3:
-            matches += 2
-            detected_patterns.append('SOPHISTICATED_VOCAB')
-        
-        # Check for excessive transition words
-        transition_count = sum(1 for word in self.transition_words if word in text_lower)
-        if transition_count >= 5:
-            matches += 1
-            detected_patterns.append('EXCESSIVE_TRANSITIONS')
-        
-        return matches, detected_patterns
+        analysis = self.analyze(text)
+        return analysis.pattern_matches, analysis.detected_patterns
     
     def calculate_ai_confidence(self, text: str) -> float:
         """
@@ -156,49 +538,7 @@ class AdvancedAIDetector:
         """
         if not text or len(text.strip()) < 30:
             return 0.0
-        
-        confidence = 0.0
-        text_lower = text.lower()
-        
-        # Check for translation markers (high confidence)
-        is_translated, translation_patterns = self.detect_translation(text)
-        if is_translated:
-            confidence += 0.6
-            if 'PERFECT_TRANSLATION' in translation_patterns:
-                confidence += 0.2
-        
-        # Check for copy markers (very high confidence)
-        is_copied, copy_patterns = self.detect_copy(text)
-        if is_copied:
-            confidence += 0.7
-            if 'AI_SIGNATURE' in copy_patterns:
-                confidence = 1.0  # Definite AI
-        
-        # Pattern detection
-        pattern_matches, patterns = self.detect_patterns(text)
-        if pattern_matches >= 5:
-            confidence += 0.3
-        elif pattern_matches >= 3:
-            confidence += 0.2
-        elif pattern_matches >= 2:
-            confidence += 0.1
-        
-        # Statistical analysis
-        stats = self.analyze_text_statistics(text)
-        
-        # Very consistent sentence length (AI characteristic)
-        if stats.get('sentence_length_std', 100) < 12 and stats.get('total_sentences', 0) > 3:
-            confidence += 0.15
-        
-        # High average sentence length (AI often writes longer sentences)
-        if stats.get('avg_sentence_length', 0) > 20:
-            confidence += 0.1
-        
-        # Check for explicit AI markers
-        if '[ai enhanced' in text_lower or '[ai assisted' in text_lower or 'chatgpt' in text_lower:
-            confidence = 1.0
-        
-        return min(confidence, 1.0)
+        return self.analyze(text).confidence
     
     def detect(self, text: str) -> Dict:
         """
@@ -219,43 +559,42 @@ class AdvancedAIDetector:
                 'statistics': {},
                 'detection_type': 'none'
             }
+
+        return detection_cache.get_or_compute(ADVANCED_CACHE_NAMESPACE, text, lambda: self.detect_uncached(text))
+
+    def detect_uncached(self, text: str) -> Dict:
+        """detect() for a non-trivial text, bypassing the result cache"""
+        analysis = self.analyze(text)
+        confidence = analysis.confidence
         
         # Check for copy first (highest priority)
-        is_copied, copy_patterns = self.detect_copy(text)
-        if is_copied:
-            confidence = self.calculate_ai_confidence(text)
+        if analysis.is_copied:
             return {
                 'is_ai_used': True,
                 'confidence': min(confidence, 1.0),
-                'patterns': copy_patterns,
-                'statistics': self.analyze_text_statistics(text),
+                'patterns': analysis.copy_patterns,
+                'statistics': analysis.statistics,
                 'detection_type': 'copy'
             }
         
         # Check for translation
-        is_translated, translation_patterns = self.detect_translation(text)
-        if is_translated:
-            confidence = self.calculate_ai_confidence(text)
+        if analysis.is_translated:
             return {
                 'is_ai_used': True,
                 'confidence': min(confidence, 1.0),
-                'patterns': translation_patterns,
-                'statistics': self.analyze_text_statistics(text),
+                'patterns': analysis.translation_patterns,
+                'statistics': analysis.statistics,
                 'detection_type': 'translation'
             }
         
         # General AI detection
-        confidence = self.calculate_ai_confidence(text)
-        _, patterns = self.detect_patterns(text)
-        stats = self.analyze_text_statistics(text)
-        
         is_ai_used = confidence >= 0.4
         
         return {
             'is_ai_used': is_ai_used,
             'confidence': round(confidence, 3),
-            'patterns': patterns,
-            'statistics': stats,
+            'patterns': analysis.detected_patterns,
+            'statistics': analysis.statistics,
             'detection_type': 'generated' if is_ai_used else 'none'
         }
 
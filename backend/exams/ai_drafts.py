@@ -0,0 +1,269 @@
+"""
+Incremental AI checks for live typing.
+The client sends a draft id plus the span it changed since its last check.
+The server keeps each draft as its lines, their features and running totals
+of everything detect_ai_text scores, so an update analyses only the lines
+it touches; the result equals detect_ai_text of the whole text.
+Drafts are kept in this process only. A draft that another worker holds, or
+that was evicted, answers 409 and the client resends the full text.
+"""
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import NamedTuple, Optional
+from .ai_detector import (
+    CASUAL_MARKERS, LATIN_WORD, PHRASE_MATCHER, SENTENCE_SPLIT,
+    Spread, TextFeatures, score_features, spread,
+)
+
+
+DRAFT_TTL = 2 * 60 * 60  # An exam never runs longer than this
+MAX_DRAFTS = 1000
+DRAFT_ID = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+# Phrase -> the PHRASE_MATCHER groups listing it, once per listing
+PHRASE_GROUPS = {}
+for name, phrases in PHRASE_MATCHER.groups.items():
+    for phrase in phrases:
+        PHRASE_GROUPS.setdefault(phrase, []).append(name)
+
+LIST_MARKER = r'\s*(?:\d+[\.\)]|[a-z][\.\)]|[-•])'
+# LIST_ITEM anchored at a line start: a marker and whitespace on the line,
+# or a marker alone on the line, which takes the following line break along
+INLINE_LIST_MARKER = re.compile(LIST_MARKER + r'\s')
+BARE_LIST_MARKER = re.compile(LIST_MARKER)
+
+
+class DraftConflict(Exception):
+    """The client's base revision does not match the server copy; resend the full text."""
+
+
+class LineFeatures(NamedTuple):
+    """What one line adds to the totals of its draft."""
+    length: int
+    phrases: frozenset
+    word_count: int
+    casual_markers: int
+    long_words: frozenset
+    paragraph_words: Optional[int]  # None when the line is too short to be a paragraph
+    quotes: int
+    sentences: Spread  # sentences between the line's first and last terminator
+    head: str  # lowered text before the first terminator, the whole line without one
+    tail: str  # lowered text after the last terminator
+    ends_sentence: bool
+    list_item: bool
+    bare_list_item: bool
+
+
+def line_features(line):
+    # Neither phrases, words nor terminator runs span a line break
+    line_lower = line.lower()
+    words = line_lower.split()
+    stripped = line.strip()
+    pieces = SENTENCE_SPLIT.split(line_lower)
+    inner = [s.strip() for s in pieces[1:-1]]
+    return LineFeatures(
+        length=len(line),
+        phrases=frozenset(PHRASE_MATCHER.find(line_lower)),
+        word_count=len(words),
+        casual_markers=sum(map(CASUAL_MARKERS.__contains__, words)),
+        long_words=frozenset(w for w in LATIN_WORD.findall(line_lower) if len(w) > 10),
+        paragraph_words=len(stripped.split()) if len(stripped) > 20 else None,
+        quotes=line.count("'"),
+        sentences=spread(len(s.split()) for s in inner if len(s) > 5),
+        head=pieces[0],
+        tail=pieces[-1],
+        ends_sentence=len(pieces) > 1,
+        list_item=INLINE_LIST_MARKER.match(line) is not None,
+        bare_list_item=BARE_LIST_MARKER.fullmatch(line) is not None,
+    )
+
+
+class Draft:
+    """
+    A draft as its lines with their features, plus running totals of what
+    detect_ai_text scores. Sentences are summed from those inside single
+    lines and those that cross line ends; list items from which lines
+    LIST_ITEM matches at.
+    """
+
+    def __init__(self, text):
+        self.rev = 1
+        self.lines = text.split('\n')
+        self.features = [line_features(line) for line in self.lines]
+        self.length = len(text)
+        self.phrases = Counter()
+        self.hits = Counter()
+        self.long_words = Counter()
+        self.word_count = self.casual_markers = self.quotes = 0
+        self.paragraphs = self.sentences = Spread(0, 0, 0)
+        for feat in self.features:
+            self.count(feat, 1)
+        self.sentences = self.sentences.plus(self.crossing_sentences(-1, len(self.lines)))
+        self.list_hits = [False] * len(self.lines)
+        self.list_items = 0
+        self.count_list_items(0, len(self.lines))
+        self.expires = None
+
+    def count(self, feat, sign):
+        """Add a line's features to the totals, or with sign=-1 take them out."""
+        self.word_count += sign * feat.word_count
+        self.casual_markers += sign * feat.casual_markers
+        self.quotes += sign * feat.quotes
+        self.sentences = self.sentences.plus(feat.sentences, sign)
+        if feat.paragraph_words is not None:
+            n = feat.paragraph_words
+            self.paragraphs = self.paragraphs.plus((1, n, n * n), sign)
+        for phrase in feat.phrases:
+            before = self.phrases[phrase]
+            self.phrases[phrase] += sign
+            if not self.phrases[phrase]:
+                del self.phrases[phrase]
+            if not before or not self.phrases[phrase]:
+                for group in PHRASE_GROUPS[phrase]:
+                    self.hits[group] += sign
+        for word in feat.long_words:
+            self.long_words[word] += sign
+            if not self.long_words[word]:
+                del self.long_words[word]
+
+    def crossing_sentences(self, first, last):
+        """
+        Spread of the sentences from the last terminator of line first to the
+        first terminator of line last, both lines ending a sentence; -1 and
+        len(lines) stand for the start and the end of the text. Lines in
+        between contribute their heads and tails only.
+        """
+        feats = self.features
+        parts = [feats[first].tail] if first >= 0 else []
+        sentences = []
+        for feat in feats[first + 1:last + 1]:
+            parts.append(feat.head)
+            if feat.ends_sentence:
+                sentences.append('\n'.join(parts).strip())
+                parts = [feat.tail]
+        if last == len(feats):
+            sentences.append('\n'.join(parts).strip())
+        return spread(len(s.split()) for s in sentences if len(s) > 5)
+
+    def count_list_items(self, line, stop):
+        """
+        Re-walk LIST_ITEM from line: every line before stop, then on until a
+        line's stored hit agrees again. A bare marker that matches takes the
+        next line break, which the following line then cannot match at.
+        """
+        feats, hits = self.features, self.list_hits
+        n = len(feats)
+        while line < n:
+            anchored = line == 0 or not (hits[line - 1] and feats[line - 1].bare_list_item)
+            feat = feats[line]
+            hit = anchored and (feat.list_item or (feat.bare_list_item and line < n - 1))
+            if line >= stop and hit == hits[line]:
+                break
+            self.list_items += hit - hits[line]
+            hits[line] = hit
+            line += 1
+
+    def locate(self, pos, line=0, offset=0):
+        """(line, column, line offset) of a text offset, walking line lengths from line at offset."""
+        while pos > offset + self.features[line].length:
+            offset += self.features[line].length + 1
+            line += 1
+        return line, pos - offset, offset
+
+    def edge(self, line, step):
+        """Nearest line from line in direction step that ends a sentence, or one past the end."""
+        while 0 <= line < len(self.lines) and not self.features[line].ends_sentence:
+            line += step
+        return line
+
+    def replace(self, start, end, inserted):
+        """Replace text[start:end] with inserted, analysing only the lines it touches."""
+        first, col_start, offset = self.locate(start)
+        last, col_end, _ = self.locate(end, first, offset)
+        new_lines = (self.lines[first][:col_start] + inserted + self.lines[last][col_end:]).split('\n')
+        new_features = [line_features(line) for line in new_lines]
+
+        before, after = self.edge(first - 1, -1), self.edge(last + 1, 1)
+        self.sentences = self.sentences.plus(self.crossing_sentences(before, after), -1)
+        for feat in self.features[first:last + 1]:
+            self.count(feat, -1)
+        self.list_items -= sum(self.list_hits[first:last + 1])
+
+        self.lines[first:last + 1] = new_lines
+        self.features[first:last + 1] = new_features
+        self.list_hits[first:last + 1] = [False] * len(new_lines)
+        shift = len(new_lines) - (last - first + 1)
+
+        for feat in new_features:
+            self.count(feat, 1)
+        self.sentences = self.sentences.plus(self.crossing_sentences(before, after + shift))
+        self.count_list_items(first, first + len(new_lines))
+        self.length += len(inserted) - (end - start)
+        self.rev += 1
+
+    def stripped_length(self):
+        """len(text.strip()), from the blank lines at either end."""
+        length = self.length
+        for lines, strip in ((self.lines, str.lstrip), (reversed(self.lines), str.rstrip)):
+            for line in lines:
+                if line.strip():
+                    length -= len(line) - len(strip(line))
+                    break
+                length -= len(line) + 1
+        return max(length, 0)
+
+    def result(self):
+        if self.word_count < 10 or self.stripped_length() < 30:
+            return {'is_ai': False, 'score': 0, 'reasons': []}
+        return score_features(TextFeatures(
+            word_count=self.word_count,
+            phrase_hits=self.hits['ai'],
+            transitions=self.hits['transitions'],
+            sentences=self.sentences,
+            paragraphs=self.paragraphs,
+            long_words=len(self.long_words),
+            quotes=self.quotes,
+            casual_markers=self.casual_markers,
+            list_items=self.list_items,
+        ))
+
+
+drafts = OrderedDict()
+drafts_lock = threading.Lock()
+
+
+def apply_update(draft_id, data):
+    """
+    Apply one update to a draft and return (rev, result).
+    data is either {'text': full_text} to (re)start the draft, or
+    {'rev': base_rev, 'start': i, 'end': j, 'text': inserted} replacing
+    text[i:j] of revision base_rev (indexes count code points).
+    """
+    if not DRAFT_ID.match(draft_id or ''):
+        raise ValueError('Invalid draft_id')
+
+    inserted = data.get('text', '')
+    if not isinstance(inserted, str):
+        raise ValueError('text must be a string')
+
+    now = time.monotonic()
+    with drafts_lock:
+        if data.get('rev') is None:
+            draft = Draft(inserted)
+        else:
+            draft = drafts.get(draft_id)
+            if draft is None or draft.expires < now or draft.rev != data['rev']:
+                raise DraftConflict()
+            start, end = data.get('start'), data.get('end')
+            if not (isinstance(start, int) and isinstance(end, int) and 0 <= start <= end <= draft.length):
+                raise DraftConflict()
+            draft.replace(start, end, inserted)
+
+        draft.expires = now + DRAFT_TTL
+        drafts[draft_id] = draft
+        drafts.move_to_end(draft_id)
+        while drafts and (len(drafts) > MAX_DRAFTS or next(iter(drafts.values())).expires < now):
+            drafts.popitem(last=False)
+        return draft.rev, draft.result()
@@ -0,0 +1,117 @@
+"""
+Stored AI-detection verdicts on Answer rows.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.db import connection, connections, transaction
+from .models import Answer
+
+
+def save_ai_verdicts(answers):
+    """
+    Write the AI fields of many answers with one executemany UPDATE.
+    Much cheaper than bulk_update, whose CASE WHEN per field and row costs
+    more than scoring the text.
+    """
+    if not answers:
+        return
+    fields = [Answer._meta.get_field(name) for name in Answer.AI_FIELDS]
+    qn = connection.ops.quote_name
+    sql = 'UPDATE %s SET %s WHERE %s = %%s' % (
+        qn(Answer._meta.db_table),
+        ', '.join('%s = %%s' % qn(f.column) for f in fields),
+        qn(Answer._meta.pk.column),
+    )
+    params = [
+        [f.get_db_prep_save(getattr(ans, f.attname), connection) for f in fields] + [ans.pk]
+        for ans in answers
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def score_stale_verdicts(answers):
+    """
+    Score text answers whose verdict is missing or comes from an older
+    detector version, without saving them. Answers need their question loaded.
+    Returns the answers that were scored.
+    """
+    from .ai_detector import DETECTOR_VERSION, detect_ai_text
+    from .grading import TEXT_TYPES
+
+    stale = [
+        ans for ans in answers
+        if ans.question.question_type in TEXT_TYPES
+        and ans.answer_text
+        and ans.ai_version != DETECTOR_VERSION
+    ]
+    for ans in stale:
+        ans.set_ai_check(detect_ai_text(ans.answer_text), DETECTOR_VERSION)
+    return stale
+
+
+def refresh_ai_verdicts(answers):
+    """Lazily score stale verdicts (see score_stale_verdicts) and store them."""
+    stale = score_stale_verdicts(answers)
+    save_ai_verdicts(stale)
+    return stale
+
+
+def score_text(text):
+    from .ai_detector import detect_ai_text
+
+    # Workers skip the result cache: every text is seen once here
+    return detect_ai_text.__wrapped__(text)
+
+
+def rescore_answers(queryset, chunk_size=500, workers=1, log=None):
+    """
+    Recompute and store AI verdicts for the writing/translation answers in
+    queryset, streaming them in primary-key chunks. Returns the number scored.
+    """
+    from .ai_detector import DETECTOR_VERSION
+    from .grading import TEXT_TYPES
+
+    queryset = queryset.filter(question__question_type__in=TEXT_TYPES).exclude(answer_text='')
+    total = queryset.count()
+    done = 0
+    last_pk = 0
+    started = time.monotonic()
+
+    pool = None
+    if workers > 1:
+        # Forked workers must not inherit open database connections
+        connections.close_all()
+        pool = ProcessPoolExecutor(max_workers=workers)
+
+    try:
+        while True:
+            rows = list(
+                queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'answer_text')[:chunk_size]
+            )
+            if not rows:
+                break
+            texts = [text for _, text in rows]
+            if pool is not None:
+                results = pool.map(score_text, texts, chunksize=max(1, len(texts) // (workers * 4)))
+            else:
+                results = map(score_text, texts)
+
+            answers = []
+            for (pk, _), result in zip(rows, results):
+                ans = Answer(pk=pk)
+                ans.set_ai_check(result, DETECTOR_VERSION)
+                answers.append(ans)
+            save_ai_verdicts(answers)
+
+            done += len(rows)
+            last_pk = rows[-1][0]
+            if log:
+                elapsed = time.monotonic() - started
+                rate = done / elapsed if elapsed > 0 else 0
+                log(f'  {done}/{total} answers rescored ({rate:.0f}/s)')
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return done
@@ -0,0 +1,286 @@
+"""
+Cached exam content and site settings.
+Exam payloads are serialized once per (level, month) and kept in the Django
+cache under a content version. Any save or delete of a Level, Month,
+Category, Question or VocabularyWord bumps the version (see signals.py), so
+stale payloads are never read again and simply expire. Site settings are
+kept per process and reloaded when their own version changes, and the
+teacher list of the admin panel filters under a version of its own. The cache is
+shared by all workers (files under data/cache by default), so a bump in one
+worker reaches the others.
+The same versions drive the HTTP validators of the read-only catalogue API.
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, Q
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from .models import SiteSettings, Teacher, Level, Month, Category, Question
+
+
+VERSION_KEY = 'catalogue:version'
+SETTINGS_VERSION_KEY = 'site-settings:version'
+TEACHERS_VERSION_KEY = 'teachers:version'
+PAYLOAD_TTL = 24 * 60 * 60
+CATALOGUE_MAX_AGE = 60  # Staff edits reach clients within a minute
+STALE_WHILE_REVALIDATE = 10 * 60
+
+_site_settings = (None, None)  # (version, SiteSettings) of this process
+
+
+def get_version(key=VERSION_KEY):
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a wiped cache never reuses an old version
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key=VERSION_KEY):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=None)
+    cache.set(f'{key}:changed', int(time.time()), timeout=None)
+
+
+def changed_at(key=VERSION_KEY):
+    """Unix time of the last bump, as far as the cache remembers."""
+    changed = cache.get(f'{key}:changed')
+    if changed is None:
+        cache.add(f'{key}:changed', int(time.time()), timeout=None)
+        changed = cache.get(f'{key}:changed')
+    return changed
+
+
+def versioned(key=VERSION_KEY, max_age=CATALOGUE_MAX_AGE):
+    """
+    Conditional GET for views that only read data covered by a version key.
+    The version is the ETag and its bump time the Last-Modified date, so a
+    matching request is answered with 304 before the view runs.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            etag = f'"{get_version(key)}"'
+            last_modified = changed_at(key)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+                patch_cache_control(
+                    response, public=True, max_age=max_age,
+                    stale_while_revalidate=STALE_WHILE_REVALIDATE,
+                )
+            return response
+        return wrapper
+    return decorator
+
+
+def site_settings():
+    """
+    The SiteSettings row, read from the database only after it changed.
+    Treat it as read-only: edit a fresh SiteSettings.load() instead.
+    """
+    global _site_settings
+    version = get_version(SETTINGS_VERSION_KEY)
+    cached_version, obj = _site_settings
+    if obj is None or cached_version != version:
+        obj = SiteSettings.load()
+        _site_settings = (version, obj)
+    return obj
+
+
+def settings_data():
+    settings_obj = site_settings()
+    return {
+        'site_name': settings_obj.site_name,
+        'tagline': settings_obj.tagline,
+        'logo_url': settings_obj.logo.url if settings_obj.logo else None,
+        'hero_image_url': settings_obj.hero_image.url if settings_obj.hero_image else None,
+    }
+
+
+def level_list():
+    """Active levels with their active month count, in one query."""
+    levels = Level.objects.filter(is_active=True).annotate(
+        num_months=Count('months', filter=Q(months__is_active=True)),
+    )
+    return [{
+        'id': lv.id,
+        'name': lv.name,
+        'slug': lv.slug,
+        'description': lv.description,
+        'color': lv.color,
+        'icon': lv.icon,
+        'order': lv.order,
+        'image_url': lv.image.url if lv.image else None,
+        'month_count': lv.num_months,
+    } for lv in levels]
+
+
+def level_info(level):
+    return {
+        'id': level.id, 'name': level.name,
+        'slug': level.slug, 'color': level.color, 'icon': level.icon,
+    }
+
+
+def month_lists(levels):
+    """
+    Active months of the given levels with question and vocabulary counts,
+    in one query. Returns {level_id: [month, ...]} ordered by month number.
+    """
+    # distinct: the two joins multiply each other's rows
+    months = Month.objects.filter(level__in=levels, is_active=True).annotate(
+        num_questions=Count('questions', distinct=True, filter=Q(
+            questions__level=F('level'), questions__is_active=True,
+        )),
+        num_vocab=Count('vocabulary', distinct=True, filter=Q(
+            vocabulary__level=F('level'), vocabulary__is_active=True,
+        )),
+    ).order_by('number')
+    data = {}
+    for m in months:
+        data.setdefault(m.level_id, []).append({
+            'id': m.id,
+            'number': m.number,
+            'name': m.name,
+            'question_count': m.num_questions,
+            'vocab_count': m.num_vocab,
+        })
+    return data
+
+
+def edit_options():
+    """
+    Levels, months and categories for the admin panel dropdowns as plain
+    dicts, cached under the catalogue version.
+    """
+    key = f'edit-options:{get_version()}'
+    options = cache.get(key)
+    if options is None:
+        months = Month.objects.order_by('level__order', 'number').values(
+            'pk', 'level_id', 'number', 'name', 'level__name',
+        )
+        options = {
+            'levels': list(Level.objects.order_by('order').values('pk', 'name', 'slug', 'icon')),
+            'months': [{**m, 'label': f"{m['level__name']} — {m['name']}"} for m in months],
+            'categories': list(Category.objects.order_by('order').values('pk', 'name', 'slug')),
+        }
+        cache.set(key, options, PAYLOAD_TTL)
+    return options
+
+
+def teacher_options():
+    """Teachers for the admin panel filters as plain dicts, cached under their own version."""
+    key = f'teacher-options:{get_version(TEACHERS_VERSION_KEY)}'
+    options = cache.get(key)
+    if options is None:
+        teachers = Teacher.objects.order_by('last_name', 'first_name', 'pk').values(
+            'pk', 'first_name', 'last_name',
+        )
+        options = [{**t, 'full_name': f"{t['first_name']} {t['last_name']}"} for t in teachers]
+        cache.set(key, options, PAYLOAD_TTL)
+    return options
+
+
+def build_exam_payload(level_slug, month_number):
+    """Exam content of one month; raises Level/Month.DoesNotExist."""
+    level = Level.objects.get(slug=level_slug, is_active=True)
+    month = Month.objects.get(level=level, number=month_number, is_active=True)
+
+    questions = Question.objects.filter(
+        level=level, month=month, is_active=True
+    ).select_related('category').order_by('category__order', 'order')
+
+    cats = []
+    seen = set()
+    questions_data = []
+    for q in questions:
+        if q.category.slug not in seen:
+            seen.add(q.category.slug)
+            cats.append({
+                'id': q.category.id,
+                'name': q.category.name,
+                'slug': q.category.slug,
+            })
+        qd = {
+            'id': q.id,
+            'category': q.category.slug,
+            'category_name': q.category.name,
+            'question_type': q.question_type,
+            'question_text': q.question_text,
+            'instructions': q.instructions,
+            'min_words': q.min_words,
+            'points': q.points,
+        }
+        if q.question_type in ('multiple_choice', 'vocabulary'):
+            qd['options'] = q.options or []
+            qd['correct_answer_index'] = q.correct_answer_index
+        questions_data.append(qd)
+
+    return {
+        'success': True,
+        'level': {'name': level.name, 'slug': level.slug, 'color': level.color},
+        'month': {'number': month.number, 'name': month.name},
+        'categories': cats,
+        'questions': questions_data,
+    }
+
+
+def exam_payload(level_slug, month_number):
+    """
+    Serialized exam payload as (body, etag), built on the first request after
+    a content change. Raises Level/Month.DoesNotExist.
+    """
+    key = f'exam-payload:{get_version()}:{level_slug}:{month_number}'
+    entry = cache.get(key)
+    if entry is None:
+        payload = build_exam_payload(level_slug, month_number)
+        body = json.dumps(payload, cls=DjangoJSONEncoder).encode()
+        entry = (body, '"%s"' % hashlib.md5(body).hexdigest())
+        cache.set(key, entry, PAYLOAD_TTL)
+    return entry
+
+
+def bootstrap_payload(level_slug=None, month_number=None):
+    """
+    Everything the student app needs before the first question, as
+    (body, etag): site settings, the level catalogue, the months of every
+    level and, when level_slug and month_number are given, that exam's
+    payload (null if it does not exist).
+    """
+    key = f'bootstrap:{get_version()}:{get_version(SETTINGS_VERSION_KEY)}'
+    entry = cache.get(key)
+    if entry is None:
+        levels = level_list()
+        months = month_lists([lv['id'] for lv in levels])
+        payload = {
+            'success': True,
+            'settings': settings_data(),
+            'levels': levels,
+            'months': {lv['slug']: months.get(lv['id'], []) for lv in levels},
+        }
+        body = json.dumps(payload, cls=DjangoJSONEncoder).encode()
+        entry = (body, hashlib.md5(body).hexdigest())
+        cache.set(key, entry, PAYLOAD_TTL)
+    body, digest = entry
+
+    if level_slug is None or month_number is None:
+        return body, f'"{digest}"'
+
+    try:
+        exam_body, exam_etag = exam_payload(level_slug, month_number)
+    except (Level.DoesNotExist, Month.DoesNotExist):
+        exam_body, exam_etag = b'null', '"null"'
+    # The exam is cached serialized already; splice it in instead of re-encoding
+    body = body[:-1] + b', "exam": ' + exam_body + b'}'
+    return body, '"%s-%s"' % (digest, exam_etag.strip('"'))
@@ -1,6 +1,6 @@
-from .models import SiteSettings
+from .catalogue import site_settings as cached_site_settings
 
 def site_settings(request):
     return {
-        'site_settings': SiteSettings.load()
+        'site_settings': cached_site_settings()
     }
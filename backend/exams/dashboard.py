@@ -0,0 +1,75 @@
+"""
+Admin dashboard figures.
+All totals come from one SELECT of scalar subqueries, and the snapshot,
+recent exams included, is cached for STATS_TTL seconds. Catalogue and
+teacher edits drop it at once (see signals.py). Students and exams, written
+on every registration, exam start and submit, show up within the TTL.
+"""
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Avg, Count, Q, Value
+from django.utils import timezone
+from .models import Teacher, Level, Category, Question, Student, ExamSession
+from .queries import score_percentage
+
+
+STATS_KEY = 'dashboard:stats'
+STATS_TTL = 30
+RECENT_EXAMS = 10
+
+
+def scalar(queryset, aggregate):
+    """(sql, params) of aggregate over the whole queryset, as a single value."""
+    return queryset.order_by().annotate(one=Value(1)).values('one').annotate(
+        value=aggregate,
+    ).values('value').query.sql_with_params()
+
+
+def compute_stats():
+    now = timezone.now()
+    today = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    finished_today = ExamSession.objects.filter(started_at__gte=today, is_completed=True)
+    parts = {
+        'total_levels': scalar(Level.objects.filter(is_active=True), Count('*')),
+        'total_questions': scalar(Question.objects.filter(is_active=True), Count('*')),
+        'total_categories': scalar(Category.objects.filter(is_active=True), Count('*')),
+        'total_exams': scalar(ExamSession.objects.filter(is_completed=True), Count('*')),
+        'total_students': scalar(Student.objects.all(), Count('*')),
+        'total_teachers': scalar(Teacher.objects.all(), Count('*')),
+        'exams_last_hour': scalar(
+            ExamSession.objects.filter(started_at__gte=now - timedelta(hours=1)), Count('*'),
+        ),
+        'exams_today': scalar(ExamSession.objects.filter(started_at__gte=today), Count('*')),
+        'completed_today': scalar(finished_today, Count('*')),
+        'avg_score_today': scalar(
+            finished_today.filter(max_score__gt=0).annotate(pct=score_percentage()), Avg('pct'),
+        ),
+    }
+    sql = 'SELECT ' + ', '.join(
+        f'({part_sql}) AS {connection.ops.quote_name(name)}'
+        for name, (part_sql, _) in parts.items()
+    )
+    params = [p for _, part_params in parts.values() for p in part_params]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        stats = dict(zip(parts, cursor.fetchone()))
+
+    stats['avg_score_today'] = round(stats['avg_score_today'] or 0, 1)
+    stats['recent_exams'] = list(ExamSession.objects.filter(is_completed=True).select_related(
+        'student__teacher', 'level', 'month',
+    ).annotate(score_pct=score_percentage()).order_by('-started_at', 'pk')[:RECENT_EXAMS])
+    stats['computed_at'] = now
+    return stats
+
+
+def dashboard_stats():
+    stats = cache.get(STATS_KEY)
+    if stats is None:
+        stats = compute_stats()
+        cache.set(STATS_KEY, stats, STATS_TTL)
+    return stats
+
+
+def invalidate_stats():
+    cache.delete(STATS_KEY)
@@ -0,0 +1,45 @@
+"""
+SQLite concurrency helpers.
+With SQLITE_TUNING enabled every new SQLite connection switches to WAL with
+the pragmas in settings.SQLITE_PRAGMAS, so readers no longer wait for writers.
+Write transactions use BEGIN IMMEDIATE: a deferred transaction that reads
+first cannot wait for the write lock and fails with "database is locked"
+as soon as another worker writes.
+"""
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created receiver; a no-op unless SQLITE_TUNING is on."""
+    if connection.vendor != 'sqlite' or not getattr(settings, 'SQLITE_TUNING', False):
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def immediate_atomic(using=None):
+    """
+    transaction.atomic() that takes the SQLite write lock when it begins,
+    waiting up to busy_timeout for it. Other databases get a plain atomic().
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    # Django opens the outermost atomic block with this hook on SQLite
+    connection.ensure_connection()
+    connection._start_transaction_under_autocommit = (
+        lambda: connection.cursor().execute('BEGIN IMMEDIATE')
+    )
+    try:
+        with transaction.atomic(using=using):
+            del connection._start_transaction_under_autocommit
+            yield
+    finally:
+        connection.__dict__.pop('_start_transaction_under_autocommit', None)
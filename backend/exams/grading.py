@@ -0,0 +1,235 @@
+"""
+Exam grading engine.
+Grades a submitted answers dict in memory, persists the Answer rows in one batch
+and builds the review payload from the graded objects without re-querying.
+Exams started through the autosave API store graded answers as they arrive;
+finishing such an exam only totals what is already saved. Exams left
+unfinished for ABANDONED_AFTER are deleted by delete_abandoned_exams().
+"""
+from datetime import timedelta
+from django.utils import timezone
+from .ai_detector import DETECTOR_VERSION, detect_ai_text
+from .ai_verdicts import save_ai_verdicts, score_stale_verdicts
+from .db import immediate_atomic
+from .item_stats import record_item_stats
+from .models import Question, ExamSession, Answer
+from .reports import record_report
+
+
+GRADABLE_TYPES = Question.GRADABLE_TYPES
+TEXT_TYPES = ('writing', 'translation')
+# An exam takes a couple of hours at most; a day leaves room to resume it
+ABANDONED_AFTER = timedelta(days=1)
+
+
+class ExamAlreadySubmitted(ValueError):
+    """The exam was completed before this write could take the lock."""
+
+    def __init__(self):
+        super().__init__('Exam already submitted')
+
+
+def parse_answers(answers_data):
+    """Map question ids to submitted values, skipping keys that are not ids."""
+    parsed = {}
+    for key, answer_value in answers_data.items():
+        try:
+            question_id = int(key)
+        except (TypeError, ValueError):
+            continue
+        parsed.setdefault(question_id, answer_value)
+    return parsed
+
+
+def grade_answers(answers_data, check_ai=True):
+    """
+    Grade answers against their active questions, loaded with a single query.
+    Returns (answers, total_score, max_score); answers are unsaved Answer objects
+    with the AI verdict of writing/translation texts set on them unless
+    check_ai is False.
+    """
+    parsed = parse_answers(answers_data)
+    questions = Question.objects.filter(is_active=True).select_related(
+        'category'
+    ).in_bulk(list(parsed))
+
+    answers = []
+    total_score = 0
+    max_score = 0
+
+    for question_id, answer_value in parsed.items():
+        question = questions.get(question_id)
+        if question is None:
+            continue
+        max_score += question.points
+
+        is_correct = None
+        points_earned = 0
+
+        if question.question_type in GRADABLE_TYPES:
+            if (question.correct_answer_index is not None
+                    and answer_value == question.correct_answer_index):
+                is_correct = True
+                points_earned = question.points
+                total_score += question.points
+            else:
+                is_correct = False
+
+        ans = Answer(
+            question=question,
+            answer_text=str(answer_value) if not isinstance(answer_value, int) else '',
+            answer_index=answer_value if isinstance(answer_value, int) else None,
+            is_correct=is_correct,
+            points_earned=points_earned,
+        )
+        if check_ai and question.question_type in TEXT_TYPES and ans.answer_text:
+            ans.set_ai_check(detect_ai_text(ans.answer_text), DETECTOR_VERSION)
+        answers.append(ans)
+
+    return answers, total_score, max_score
+
+
+def save_exam(answers, total_score, max_score, **exam_fields):
+    """
+    Create the completed ExamSession, bulk insert its answers and add them to
+    the item statistics and the teacher's reports, in one transaction.
+    """
+    with immediate_atomic():
+        exam = ExamSession.objects.create(
+            total_score=total_score,
+            max_score=max_score,
+            **exam_fields,
+        )
+        for ans in answers:
+            ans.exam_session = exam
+        Answer.objects.bulk_create(answers)
+        record_item_stats(answers)
+        record_report(exam, answers)
+    return exam
+
+
+def upsert_answers(exam, answers):
+    """
+    Insert or overwrite the exam's answers with one INSERT ... ON CONFLICT.
+    Verdicts of overwritten texts are cleared; finish_exam scores them again.
+    Raises ExamAlreadySubmitted once the exam is completed.
+    """
+    if not answers:
+        return
+    for ans in answers:
+        ans.exam_session = exam
+    with immediate_atomic():
+        # Checked under the write lock, so no answer lands in a graded exam
+        if not ExamSession.objects.filter(pk=exam.pk, is_completed=False).exists():
+            raise ExamAlreadySubmitted()
+        Answer.objects.bulk_create(
+            answers,
+            update_conflicts=True,
+            unique_fields=['exam_session', 'question'],
+            update_fields=['answer_text', 'answer_index', 'is_correct', 'points_earned'] + Answer.AI_FIELDS,
+        )
+
+
+def delete_abandoned_exams(student=None):
+    """
+    Delete the exams started more than ABANDONED_AFTER ago and never
+    finished, optionally of one student only. Returns how many went.
+    """
+    exams = ExamSession.objects.filter(is_completed=False, started_at__lt=timezone.now() - ABANDONED_AFTER)
+    if student is not None:
+        exams = exams.filter(student=student)
+    _, deleted = exams.delete()
+    return deleted.get(ExamSession._meta.label, 0)
+
+
+def finish_exam(exam, answers_data=None):
+    """
+    Complete an autosaved exam: store the answers not yet autosaved, score
+    missing AI verdicts and total the saved answers. Returns
+    (answers, total_score, max_score) like grade_answers.
+    AI scoring runs before the write transaction, not inside it; the
+    transaction reads the answers again and totals exactly what it completes.
+    """
+    pending = grade_answers(answers_data, check_ai=False)[0] if answers_data else []
+    upsert_answers(exam, pending)
+    scored = {
+        ans.pk: ans
+        for ans in score_stale_verdicts(list(exam.answers.select_related('question')))
+    }
+
+    with immediate_atomic():
+        # An autosave may have landed since the answers were scored
+        answers = list(exam.answers.select_related('question', 'question__category'))
+        for ans in answers:
+            done = scored.get(ans.pk)
+            if done is not None and done.answer_text == ans.answer_text:
+                for name in Answer.AI_FIELDS:
+                    setattr(ans, name, getattr(done, name))
+        # Only texts changed by such an autosave are still unscored
+        rescored = {ans.pk for ans in score_stale_verdicts(answers)}
+        save_ai_verdicts([ans for ans in answers if ans.pk in scored or ans.pk in rescored])
+
+        exam.total_score = sum(ans.question.points for ans in answers if ans.is_correct)
+        exam.max_score = sum(ans.question.points for ans in answers)
+        exam.is_completed = True
+        exam.completed_at = timezone.now()
+        # A concurrent submit of the same exam may have finished it meanwhile
+        finished = ExamSession.objects.filter(pk=exam.pk, is_completed=False).update(
+            total_score=exam.total_score,
+            max_score=exam.max_score,
+            is_completed=True,
+            completed_at=exam.completed_at,
+        )
+        if not finished:
+            raise ExamAlreadySubmitted()
+        record_item_stats(answers)
+        record_report(exam, answers)
+    return answers, exam.total_score, exam.max_score
+
+
+def build_review(answers):
+    """
+    Build the review list and score counts from graded answers.
+    Returns (review, correct_count, total_gradable).
+    """
+    review = []
+    correct_count = 0
+    total_gradable = 0
+
+    ordered = sorted(answers, key=lambda a: (a.question.category.order, a.question.order))
+    for ans in ordered:
+        q = ans.question
+        item = {
+            'questionId': q.id,
+            'category': q.category.slug,
+            'categoryName': q.category.name,
+            'questionType': q.question_type,
+            'questionText': q.question_text,
+            'isCorrect': ans.is_correct,
+        }
+        if ans.is_correct:
+            correct_count += 1
+        if q.question_type in GRADABLE_TYPES:
+            total_gradable += 1
+            item['options'] = q.options or []
+            item['correctIndex'] = q.correct_answer_index
+            ci = q.correct_answer_index
+            item['correctAnswer'] = (
+                q.options[ci]
+                if q.options and ci is not None and ci < len(q.options)
+                else ''
+            )
+            ai_idx = ans.answer_index
+            item['yourAnswer'] = (
+                q.options[ai_idx]
+                if ai_idx is not None and q.options and ai_idx < len(q.options)
+                else 'No answer'
+            )
+            item['yourIndex'] = ai_idx
+        else:
+            item['yourAnswer'] = ans.answer_text or 'No answer'
+            if ans.ai_check is not None:
+                item['aiCheck'] = ans.ai_check
+        review.append(item)
+
+    return review, correct_count, total_gradable
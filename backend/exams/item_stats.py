@@ -0,0 +1,87 @@
+"""
+Per-question item statistics (QuestionStats).
+Submitting an exam adds its answers to the rows of their questions in the
+transaction that completes the exam, and deleting a completed exam takes
+them back out, so every exam is counted exactly once. Only indexes of a
+question's own options enter its histogram. rebuild_item_stats()
+recomputes the whole table from the stored answers.
+"""
+from django.db.models import Count, Q, Sum
+from .models import Answer, Question, QuestionStats
+
+
+STATS_FIELDS = ['attempts', 'graded', 'correct', 'points_total', 'option_counts', 'p_value', 'updated_at']
+
+
+def record_item_stats(answers, sign=1):
+    """
+    Add a completed exam's answers, with their questions loaded, to their
+    questions' statistics, or with sign=-1 remove them: one INSERT for
+    missing rows, one locking SELECT and one bulk UPDATE. Call it inside
+    the transaction that completes or deletes the exam.
+    """
+    question_ids = sorted({ans.question_id for ans in answers})
+    if not question_ids:
+        return
+    if sign > 0:
+        QuestionStats.objects.bulk_create(
+            [QuestionStats(question_id=pk) for pk in question_ids], ignore_conflicts=True,
+        )
+    # Locked in primary key order, so concurrent submits cannot deadlock
+    stats = {
+        s.question_id: s
+        for s in QuestionStats.objects.select_for_update().filter(
+            question_id__in=question_ids,
+        ).order_by('question_id')
+    }
+    for ans in answers:
+        if ans.question_id in stats:
+            stats[ans.question_id].add(ans, sign)
+    QuestionStats.objects.bulk_update(stats.values(), STATS_FIELDS)
+
+
+def rebuild_item_stats(batch_size=2000):
+    """
+    Recompute every row from the answers of completed exams with two
+    GROUP BY queries and one read of the answered questions' option lists.
+    Returns the number of questions with statistics.
+    """
+    answers = Answer.objects.filter(exam_session__is_completed=True).order_by()
+    totals = answers.values('question_id').annotate(
+        attempts=Count('pk'),
+        graded=Count('pk', filter=Q(is_correct__isnull=False)),
+        correct=Count('pk', filter=Q(is_correct=True)),
+        points_total=Sum('points_earned'),
+    )
+    chosen = list(answers.filter(
+        answer_index__gte=0, question__question_type__in=Question.GRADABLE_TYPES,
+    ).values('question_id', 'answer_index').annotate(n=Count('pk')))
+    num_options = {
+        pk: len(opts or [])
+        for pk, opts in Question.objects.filter(
+            pk__in=answers.values('question_id'),
+        ).values_list('pk', 'options').iterator()
+    }
+    options = {}
+    for row in chosen:
+        # Indexes past the question's options were never a real choice
+        if row['answer_index'] >= num_options.get(row['question_id'], 0):
+            continue
+        counts = options.setdefault(row['question_id'], [])
+        counts.extend([0] * (row['answer_index'] + 1 - len(counts)))
+        counts[row['answer_index']] = row['n']
+
+    rows = []
+    for row in totals:
+        rows.append(QuestionStats(
+            question_id=row['question_id'],
+            attempts=row['attempts'],
+            graded=row['graded'],
+            correct=row['correct'],
+            points_total=row['points_total'] or 0,
+            option_counts=options.get(row['question_id'], []),
+            p_value=round(row['correct'] / row['graded'], 4) if row['graded'] else None,
+        ))
+    QuestionStats.objects.all().delete()
+    QuestionStats.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
@@ -0,0 +1,201 @@
+"""
+Query plans and timings of the hot read paths. Meant for a copy of the
+database: --seed writes synthetic students and exams, and --drop-indexes
+drops the tuning indexes inside a transaction held for the whole run,
+which locks the tables against every other writer (ACCESS EXCLUSIVE on
+PostgreSQL). Both must be asked for explicitly.
+"""
+import random
+import statistics
+import time
+import uuid
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from exams.db import immediate_atomic
+from exams.item_stats import rebuild_item_stats
+from exams.models import Teacher, Month, Question, VocabularyWord, Student, ExamSession, Answer
+from exams.reports import rebuild_reports
+
+
+# Indexes added for these query shapes (migration 0005)
+BENCHMARK_INDEXES = [
+    'exam_started_idx',
+    'exam_level_month_idx',
+    'question_month_active_idx',
+    'vocab_month_active_idx',
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+def hot_queries():
+    """The read paths that dominate traffic, as (label, queryset) pairs."""
+    month = Month.objects.select_related('level').order_by('-pk').first()
+    if month is None:
+        raise CommandError('No months found; run load_initial_data first')
+    level = month.level
+    exam = ExamSession.objects.order_by('-pk').first()
+    return [
+        ('exam payload', Question.objects.filter(
+            level=level, month=month, is_active=True,
+        ).select_related('category').order_by('category__order', 'order')),
+        ('vocabulary', VocabularyWord.objects.filter(
+            level=level, month=month, is_active=True,
+        ).order_by('order')),
+        ('latest exams', ExamSession.objects.select_related(
+            'student', 'level', 'month',
+        ).order_by('-started_at')[:50]),
+        ('completed exams', ExamSession.objects.filter(
+            is_completed=True,
+        ).order_by('-started_at')[:50]),
+        ('exams of a month', ExamSession.objects.filter(
+            level=level, month=month, is_completed=True,
+        ).order_by('-started_at')[:50]),
+        ('exam answers', Answer.objects.filter(
+            exam_session=exam,
+        ).select_related('question', 'question__category')),
+    ]
+
+
+def query_plan(queryset, tag):
+    """
+    EXPLAIN output of queryset. The tag comment makes the SQL text unique, as
+    sqlite3's statement cache would otherwise replay a plan from before the
+    indexes were dropped.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} /* {tag} */ {sql}', params)
+        return [' '.join(str(col) for col in row) for row in cursor.fetchall()]
+
+
+def time_query(queryset, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list(queryset.all())
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def seed_exams(count, answers_per_exam, log):
+    """Insert count synthetic exams spread over the last year."""
+    months = list(Month.objects.select_related('level'))
+    questions = {}
+    for q in Question.objects.filter(is_active=True).values('id', 'month_id', 'points'):
+        questions.setdefault(q['month_id'], []).append(q)
+    teacher, _ = Teacher.objects.get_or_create(first_name='Benchmark', last_name='Teacher')
+    students = [
+        Student(first_name=f'Student{i}', last_name='Benchmark', teacher=teacher)
+        for i in range(200)
+    ]
+    Student.objects.bulk_create(students)
+    students = list(Student.objects.filter(teacher=teacher))
+
+    now = timezone.now()
+    started_at = ExamSession._meta.get_field('started_at')
+    # Let bulk_create keep the generated dates
+    started_at.auto_now_add = False
+    try:
+        done = 0
+        while done < count:
+            batch = []
+            for _ in range(min(5000, count - done)):
+                month = random.choice(months)
+                started = now - timedelta(seconds=random.randrange(365 * 24 * 3600))
+                completed = random.random() < 0.9
+                batch.append(ExamSession(
+                    student=random.choice(students), level=month.level, month=month,
+                    session_id=str(uuid.uuid4()), started_at=started,
+                    completed_at=started + timedelta(minutes=40) if completed else None,
+                    is_completed=completed,
+                ))
+            with transaction.atomic():
+                ExamSession.objects.bulk_create(batch)
+                if answers_per_exam:
+                    ids = dict(ExamSession.objects.filter(
+                        session_id__in=[e.session_id for e in batch]
+                    ).values_list('session_id', 'id'))
+                    answers = []
+                    for e in batch:
+                        pool = questions.get(e.month_id, [])
+                        for q in random.sample(pool, min(answers_per_exam, len(pool))):
+                            correct = random.random() < 0.6
+                            answers.append(Answer(
+                                exam_session_id=ids[e.session_id], question_id=q['id'],
+                                answer_index=0, is_correct=correct,
+                                points_earned=q['points'] if correct else 0,
+                            ))
+                    Answer.objects.bulk_create(answers)
+            done += len(batch)
+            log(f'  {done}/{count} exams seeded')
+    finally:
+        started_at.auto_now_add = True
+    # The seeded exams skipped submit, which keeps these tables up to date
+    with immediate_atomic():
+        rebuild_item_stats()
+        rebuild_reports()
+
+
+class Command(BaseCommand):
+    help = 'Show query plans and timings of the hot read queries, with and without the tuning indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='First insert this many synthetic exams (needs --yes-seed)')
+        parser.add_argument('--yes-seed', action='store_true',
+                            help='Confirm that the configured database is a copy that --seed may write to')
+        parser.add_argument('--drop-indexes', action='store_true',
+                            help='Also time the queries without the tuning indexes; locks the tables '
+                                 'for the whole run, so only on a copy of the database')
+        parser.add_argument('--answers-per-exam', type=int, default=5,
+                            help='Answers created for every seeded exam')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Runs per query; the median is reported')
+
+    def handle(self, *args, **options):
+        if options['seed'] and not options['yes_seed']:
+            raise CommandError(
+                f'--seed writes synthetic rows into {connection.settings_dict["NAME"]}; '
+                'run it on a copy of the database and pass --yes-seed'
+            )
+        if options['seed']:
+            seed_exams(options['seed'], options['answers_per_exam'], self.stdout.write)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{ExamSession.objects.count()} exams, {Answer.objects.count()} answers'
+        ))
+        with_indexes = self.run_queries('With indexes', options['repeat'])
+        if not options['drop_indexes']:
+            return
+
+        # Drop the indexes inside a transaction that is rolled back afterwards
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    for name in BENCHMARK_INDEXES:
+                        cursor.execute('DROP INDEX %s' % connection.ops.quote_name(name))
+                without = self.run_queries('Without indexes', options['repeat'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Summary (median ms)'))
+        for label, ms in with_indexes.items():
+            self.stdout.write(f'  {label:<20} {without[label]:>9.2f} -> {ms:>7.2f}')
+
+    def run_queries(self, title, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        results = {}
+        for label, queryset in hot_queries():
+            results[label] = time_query(queryset, repeat)
+            self.stdout.write(f'  {label}: {results[label]:.2f} ms')
+            for line in query_plan(queryset, title):
+                self.stdout.write(f'      {line}')
+        return results
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from exams.grading import ABANDONED_AFTER, delete_abandoned_exams
+
+
+class Command(BaseCommand):
+    help = f'Delete exams started more than {ABANDONED_AFTER} ago and never finished'
+
+    def handle(self, *args, **options):
+        count = delete_abandoned_exams()
+        self.stdout.write(self.style.SUCCESS(f'{count} abandoned exams deleted'))
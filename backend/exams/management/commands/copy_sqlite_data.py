@@ -0,0 +1,120 @@
+from contextlib import contextmanager
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission, User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from exams.models import (
+    SiteSettings, Teacher, Level, Month, Category, Question,
+    VocabularyWord, Student, ExamSession, Answer, QuestionStats, PerformanceRollup
+)
+
+
+SOURCE = 'sqlite_source'
+
+# Parents before children, so foreign keys always point at copied rows
+MODELS = [
+    Group, User, SiteSettings, Teacher, Level, Month, Category, Question,
+    VocabularyWord, Student, ExamSession, Answer, QuestionStats, PerformanceRollup,
+]
+
+
+@contextmanager
+def keep_timestamps(model):
+    """Stop auto_now/auto_now_add fields from overwriting the copied values."""
+    fields = [
+        f for f in model._meta.concrete_fields
+        if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)
+    ]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def permission_ids():
+    """
+    Map source permission ids to target ids. Both databases create their
+    permissions in migrate, so the same (app_label, codename) may differ in id.
+    """
+    target = {
+        (app_label, codename): pk
+        for pk, app_label, codename in Permission.objects.using('default').values_list(
+            'pk', 'content_type__app_label', 'codename'
+        )
+    }
+    return {
+        pk: target.get((app_label, codename))
+        for pk, app_label, codename in Permission.objects.using(SOURCE).values_list(
+            'pk', 'content_type__app_label', 'codename'
+        )
+    }
+
+
+def copy_model(model, batch_size, perm_ids, log):
+    qs = model._default_manager.using(SOURCE).order_by('pk')
+    total = qs.count()
+    done = 0
+    last_pk = None
+    with keep_timestamps(model):
+        while True:
+            chunk = qs if last_pk is None else qs.filter(pk__gt=last_pk)
+            rows = list(chunk[:batch_size])
+            if not rows:
+                break
+            model._default_manager.using('default').bulk_create(rows)
+            done += len(rows)
+            last_pk = rows[-1].pk
+    # Many-to-many links (user groups and permissions) are rows of their own
+    for field in model._meta.many_to_many:
+        through = field.remote_field.through
+        links = list(through._default_manager.using(SOURCE).all())
+        if field.related_model is Permission:
+            for link in links:
+                link.permission_id = perm_ids.get(link.permission_id)
+            links = [link for link in links if link.permission_id is not None]
+        through._default_manager.using('default').bulk_create(links, batch_size=batch_size)
+    log(f'  {model._meta.label}: {done}/{total}')
+
+
+class Command(BaseCommand):
+    help = 'Copy all data from the SQLite database file into the configured (PostgreSQL) database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=str(settings.SQLITE_PATH),
+                            help='SQLite file to copy from')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        connections.settings[SOURCE] = connections.configure_settings({
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': options['source']},
+        })['default']
+        source, target = connections[SOURCE], connections['default']
+        if target.vendor == 'sqlite':
+            raise CommandError('The default database is SQLite; set DATABASE_URL first')
+
+        applied = set(MigrationRecorder(source).applied_migrations())
+        if applied != set(MigrationRecorder(target).applied_migrations()):
+            raise CommandError(
+                'Source and target are at different migrations; run migrate on both '
+                '(for the SQLite file: unset DATABASE_URL and run manage.py migrate)'
+            )
+        for model in MODELS:
+            if model._default_manager.using('default').exists():
+                raise CommandError(f'{model._meta.label} already has rows in the target database')
+
+        perm_ids = permission_ids()
+        with transaction.atomic(using='default'):
+            for model in MODELS:
+                copy_model(model, options['batch_size'], perm_ids, self.stdout.write)
+            # Primary keys were copied, so move the sequences past them
+            with target.cursor() as cursor:
+                for sql in target.ops.sequence_reset_sql(no_style(), MODELS):
+                    cursor.execute(sql)
+
+        self.stdout.write(self.style.SUCCESS(f'Copied {options["source"]} into {target.settings_dict["NAME"]}'))
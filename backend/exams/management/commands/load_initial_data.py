@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from exams.models import Level, Month, Category, Question, VocabularyWord
+from exams.catalogue import bump_version
 
 
 LEVELS = [
@@ -293,6 +294,8 @@ def load_data():
             ))
 
     Question.objects.bulk_create(bulk, ignore_conflicts=True)
+    # bulk_create sends no post_save signals
+    bump_version()
     total = Question.objects.count()
     print(f"\n  {total} questions loaded successfully!")
     print(f"  {Level.objects.count()} levels, {Month.objects.count()} months")
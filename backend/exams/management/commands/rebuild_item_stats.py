@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from exams.db import immediate_atomic
+from exams.item_stats import rebuild_item_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-question item statistics from the answers of completed exams'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        # Holds the write lock, so no submit is counted twice or lost meanwhile
+        with immediate_atomic():
+            count = rebuild_item_stats(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Statistics of {count} questions rebuilt in {time.monotonic() - started:.1f}s'
+        ))
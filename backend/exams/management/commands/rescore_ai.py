@@ -0,0 +1,35 @@
+import os
+import time
+from django.core.management.base import BaseCommand
+from exams.ai_detector import DETECTOR_VERSION
+from exams.ai_verdicts import rescore_answers
+from exams.models import Answer
+
+
+class Command(BaseCommand):
+    help = 'Recompute stored AI-detection verdicts for writing and translation answers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Answers read, scored and written per batch')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes used for scoring (1 = no pool)')
+        parser.add_argument('--all', action='store_true',
+                            help='Rescore every answer, not only missing or outdated verdicts')
+
+    def handle(self, *args, **options):
+        qs = Answer.objects.all()
+        if not options['all']:
+            qs = qs.exclude(ai_version=DETECTOR_VERSION)
+
+        started = time.monotonic()
+        done = rescore_answers(
+            qs,
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            log=self.stdout.write,
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{done} answers rescored with detector v{DETECTOR_VERSION} in {elapsed:.1f}s'
+        ))
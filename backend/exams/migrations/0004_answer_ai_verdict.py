@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0003_sitesettings_hero_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='ai_label',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='ai_reasons',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='ai_score',
+            field=models.IntegerField(blank=True, help_text='AI detektor bahosi (0-100)', null=True),
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='ai_version',
+            field=models.IntegerField(blank=True, help_text='Bahoni hisoblagan detektor versiyasi', null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0004_answer_ai_verdict'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='examsession',
+            index=models.Index(fields=['-started_at'], name='exam_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examsession',
+            index=models.Index(fields=['level', 'month', '-started_at'], name='exam_level_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['level', 'month', 'is_active', 'order'], name='question_month_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vocabularyword',
+            index=models.Index(fields=['level', 'month', 'is_active', 'order'], name='vocab_month_active_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0005_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='exams.question')),
+                ('attempts', models.IntegerField(default=0)),
+                ('graded', models.IntegerField(default=0, help_text='Avtomatik baholangan javoblar')),
+                ('correct', models.IntegerField(default=0)),
+                ('points_total', models.FloatField(default=0)),
+                ('option_counts', models.JSONField(blank=True, default=list, help_text='Har bir variant necha marta tanlangan')),
+                ('p_value', models.FloatField(blank=True, help_text="To'g'ri javoblar ulushi (0-1)", null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Savol statistikasi',
+                'verbose_name_plural': 'Savollar statistikasi',
+                'indexes': [models.Index(fields=['p_value'], name='question_stats_p_idx')],
+            },
+        ),
+    ]
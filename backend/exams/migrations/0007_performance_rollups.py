@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0006_question_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerformanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exams', models.IntegerField(default=0)),
+                ('pct_total', models.FloatField(default=0, help_text="Foizlar yig'indisi; o'rtachasi pct_total / exams")),
+                ('band_below_50', models.IntegerField(default=0, help_text='50% dan past')),
+                ('band_50', models.IntegerField(default=0, help_text='50–69%')),
+                ('band_70', models.IntegerField(default=0, help_text='70–89%')),
+                ('band_90', models.IntegerField(default=0, help_text='90% va yuqori')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='exams.category')),
+                ('level', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='exams.level')),
+                ('month', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='exams.month')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='exams.teacher')),
+            ],
+            options={
+                'verbose_name': 'Natijalar hisoboti',
+                'verbose_name_plural': 'Natijalar hisobotlari',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='performancerollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('teacher', 'level', 'month'), name='rollup_exam_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='performancerollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', False)), fields=('teacher', 'level', 'month', 'category'), name='rollup_category_uniq'),
+        ),
+    ]
@@ -117,6 +117,8 @@ class Question(models.Model):
         ('writing', 'Writing'),
         ('vocabulary', 'Vocabulary'),
     ]
+    # Types graded automatically by the chosen option
+    GRADABLE_TYPES = ('multiple_choice', 'vocabulary')
 
     level = models.ForeignKey(Level, on_delete=models.CASCADE, related_name='questions')
     month = models.ForeignKey(Month, on_delete=models.CASCADE, related_name='questions')
@@ -136,6 +138,10 @@ class Question(models.Model):
 
     class Meta:
         ordering = ['level__order', 'month__number', 'category__order', 'order', 'id']
+        indexes = [
+            # Exam payloads: active questions of one month
+            models.Index(fields=['level', 'month', 'is_active', 'order'], name='question_month_active_idx'),
+        ]
 
     def __str__(self):
         return f"[{self.level.name}/{self.month.name}] {self.category.name}: {self.question_text[:60]}"
@@ -154,6 +160,9 @@ class VocabularyWord(models.Model):
 
     class Meta:
         ordering = ['level__order', 'month__number', 'order']
+        indexes = [
+            models.Index(fields=['level', 'month', 'is_active', 'order'], name='vocab_month_active_idx'),
+        ]
         verbose_name = "Vocabulary Word"
         verbose_name_plural = "Vocabulary Words"
 
@@ -193,6 +202,12 @@ class ExamSession(models.Model):
 
     class Meta:
         ordering = ['-started_at']
+        indexes = [
+            # Newest first; is_completed is filtered while scanning, since
+            # SQLite cannot use an index for a bare boolean condition
+            models.Index(fields=['-started_at'], name='exam_started_idx'),
+            models.Index(fields=['level', 'month', '-started_at'], name='exam_level_month_idx'),
+        ]
         verbose_name = "Imtihon"
         verbose_name_plural = "Imtihonlar"
 
@@ -213,11 +228,140 @@ class Answer(models.Model):
     answer_index = models.IntegerField(null=True, blank=True)
     is_correct = models.BooleanField(null=True, blank=True)
     points_earned = models.FloatField(default=0)
+    ai_score = models.IntegerField(null=True, blank=True, help_text="AI detektor bahosi (0-100)")
+    ai_label = models.CharField(max_length=50, blank=True)
+    ai_reasons = models.JSONField(default=list, blank=True)
+    ai_version = models.IntegerField(null=True, blank=True, help_text="Bahoni hisoblagan detektor versiyasi")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    AI_FIELDS = ['ai_score', 'ai_label', 'ai_reasons', 'ai_version']
+
     class Meta:
         unique_together = ['exam_session', 'question']
         ordering = ['question__category__order', 'question__order']
 
     def __str__(self):
         return f"{self.exam_session.student.full_name} — Q{self.question.id}"
+
+    def set_ai_check(self, result, version):
+        self.ai_score = result['score']
+        self.ai_label = result.get('label', '')
+        self.ai_reasons = result['reasons']
+        self.ai_version = version
+
+    @property
+    def ai_check(self):
+        """Stored AI verdict in the detector's result format, or None if never checked."""
+        if self.ai_version is None:
+            return None
+        result = {
+            'is_ai': self.ai_score >= 40,
+            'score': self.ai_score,
+            'reasons': self.ai_reasons,
+        }
+        if self.ai_label:
+            result['label'] = self.ai_label
+        return result
+
+
+class QuestionStats(models.Model):
+    """Item statistics of a question over the answers of completed exams."""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    attempts = models.IntegerField(default=0)
+    graded = models.IntegerField(default=0, help_text="Avtomatik baholangan javoblar")
+    correct = models.IntegerField(default=0)
+    points_total = models.FloatField(default=0)
+    option_counts = models.JSONField(default=list, blank=True, help_text="Har bir variant necha marta tanlangan")
+    p_value = models.FloatField(null=True, blank=True, help_text="To'g'ri javoblar ulushi (0-1)")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['p_value'], name='question_stats_p_idx'),
+        ]
+        verbose_name = "Savol statistikasi"
+        verbose_name_plural = "Savollar statistikasi"
+
+    def __str__(self):
+        return f"Q{self.question_id}: {self.correct}/{self.graded}"
+
+    @property
+    def mean_points(self):
+        return round(self.points_total / self.attempts, 2) if self.attempts else 0
+
+    @staticmethod
+    def option_index(answer):
+        """Index of the option the answer chose, or None if it names none of the question's options."""
+        question = answer.question
+        if question.question_type not in Question.GRADABLE_TYPES or answer.answer_index is None:
+            return None
+        return answer.answer_index if 0 <= answer.answer_index < len(question.options or []) else None
+
+    def add(self, answer, sign=1):
+        """Count one more answer to the question, or remove it with sign=-1."""
+        self.attempts += sign
+        self.points_total += sign * answer.points_earned
+        if answer.is_correct is not None:
+            self.graded += sign
+            self.correct += sign * answer.is_correct
+        index = self.option_index(answer)
+        if index is not None:
+            counts = list(self.option_counts or [])
+            counts.extend([0] * (index + 1 - len(counts)))
+            counts[index] += sign
+            self.option_counts = counts
+        self.p_value = round(self.correct / self.graded, 4) if self.graded else None
+
+
+class PerformanceRollup(models.Model):
+    """
+    Results of a teacher's students in one level month: the whole exam when
+    category is empty, otherwise the answers of one category.
+    """
+    BANDS = (50, 70, 90)
+    BAND_FIELDS = ['band_below_50', 'band_50', 'band_70', 'band_90']
+
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name='rollups')
+    level = models.ForeignKey(Level, on_delete=models.CASCADE, related_name='rollups')
+    month = models.ForeignKey(Month, on_delete=models.CASCADE, related_name='rollups')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='rollups')
+    exams = models.IntegerField(default=0)
+    pct_total = models.FloatField(default=0, help_text="Foizlar yig'indisi; o'rtachasi pct_total / exams")
+    band_below_50 = models.IntegerField(default=0, help_text="50% dan past")
+    band_50 = models.IntegerField(default=0, help_text="50–69%")
+    band_70 = models.IntegerField(default=0, help_text="70–89%")
+    band_90 = models.IntegerField(default=0, help_text="90% va yuqori")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['teacher', 'level', 'month'], condition=models.Q(category__isnull=True),
+                name='rollup_exam_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['teacher', 'level', 'month', 'category'], condition=models.Q(category__isnull=False),
+                name='rollup_category_uniq',
+            ),
+        ]
+        verbose_name = "Natijalar hisoboti"
+        verbose_name_plural = "Natijalar hisobotlari"
+
+    def __str__(self):
+        return f"{self.teacher_id}/{self.month_id}/{self.category_id or '-'}: {self.exams}"
+
+    @property
+    def mean_pct(self):
+        return round(self.pct_total / self.exams, 1) if self.exams else 0
+
+    @classmethod
+    def band_field(cls, pct):
+        """Name of the distribution column a percentage is counted in."""
+        return cls.BAND_FIELDS[sum(pct >= bound for bound in cls.BANDS)]
+
+    def add(self, pct, sign=1):
+        """Count one more exam with the given percentage, or remove it with sign=-1."""
+        self.exams += sign
+        self.pct_total += sign * pct
+        field = self.band_field(pct)
+        setattr(self, field, getattr(self, field) + sign)
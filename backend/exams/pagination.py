@@ -0,0 +1,105 @@
+"""
+Pagination of the admin panel lists.
+A page is "the next N rows after the last one shown", read with one index
+range scan, so the hundredth page costs the same as the first. OFFSET
+pages instead read and throw away every row before them; they are kept for
+short lists and for orders no index can serve.
+"""
+from urllib.parse import urlencode
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+PAGE_SIZES = (25, 50, 100)
+DEFAULT_PAGE_SIZE = 50
+
+
+def page_size(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(request.GET.get('size', default))
+    except ValueError:
+        return default
+    return size if size in PAGE_SIZES else default
+
+
+def encode_cursor(obj, field):
+    return f'{getattr(obj, field).isoformat()}~{obj.pk}'
+
+
+def decode_cursor(cursor):
+    """(datetime, pk) from a cursor, or None if it is malformed."""
+    value, _, pk = (cursor or '').rpartition('~')
+    try:
+        value, pk = parse_datetime(value), int(pk)
+    except (TypeError, ValueError):
+        return None
+    if value is None:
+        return None
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value, pk
+
+
+def page_url(params, **changes):
+    """Query string of params with changes applied; empty values are dropped."""
+    query = {k: v for k, v in {**params, **changes}.items() if v not in (None, '')}
+    return '?' + urlencode(query)
+
+
+def page_links(page, params):
+    """prev_url/next_url of a numbered Paginator page, for panel/pager.html."""
+    return {
+        'prev_url': page_url(params, page=page.previous_page_number()) if page.has_previous() else '',
+        'next_url': page_url(params, page=page.next_page_number()) if page.has_next() else '',
+    }
+
+
+def numbered_page(queryset, request, params):
+    """Paginator page of queryset with its pager context."""
+    page = Paginator(queryset, params['size']).get_page(request.GET.get('page'))
+    return page, {'page': page, **page_links(page, params)}
+
+
+class KeysetPage:
+    def __init__(self, rows, field, has_next, has_prev):
+        self.rows = rows
+        self.has_next = has_next and bool(rows)
+        self.has_prev = has_prev and bool(rows)
+        self.next_cursor = encode_cursor(rows[-1], field) if self.has_next else None
+        self.prev_cursor = encode_cursor(rows[0], field) if self.has_prev else None
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def keyset_page(queryset, request, field, size):
+    """
+    One page of queryset ordered by (-field, pk). ?after= gives the page
+    following a cursor, ?before= the page preceding it, neither the first page.
+    The pk tie-break keeps rows with equal field values from being skipped; it
+    is ascending because an index on -field lists equal values by rowid.
+    """
+    after = decode_cursor(request.GET.get('after'))
+    before = decode_cursor(request.GET.get('before')) if after is None else None
+
+    if before is not None:
+        value, pk = before
+        rows = list(queryset.filter(**{f'{field}__gte': value}).exclude(
+            Q(**{field: value}) & Q(pk__gte=pk)
+        ).order_by(field, '-pk')[:size + 1])
+        has_prev = len(rows) > size
+        return KeysetPage(rows[:size][::-1], field, has_next=True, has_prev=has_prev)
+
+    if after is not None:
+        value, pk = after
+        # A range on field, which the index can serve, minus the ties already shown
+        queryset = queryset.filter(**{f'{field}__lte': value}).exclude(
+            Q(**{field: value}) & Q(pk__lte=pk)
+        )
+    rows = list(queryset.order_by(f'-{field}', 'pk')[:size + 1])
+    return KeysetPage(rows[:size], field, has_next=len(rows) > size, has_prev=after is not None)
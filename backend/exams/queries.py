@@ -0,0 +1,26 @@
+"""Query expressions shared by the admin panel and the Django admin."""
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+from .models import Question
+
+
+def score_percentage():
+    """ExamSession.percentage computed in SQL, for annotate()."""
+    return Case(
+        When(max_score__gt=0, then=Cast(
+            Round(F('total_score') * 100 / F('max_score'), 1), FloatField()
+        )),
+        default=Value(0.0), output_field=FloatField(),
+    )
+
+
+def active_question_count():
+    """
+    Active questions an exam of the month serves, for annotating a Month
+    queryset. Counted per row on question_month_active_idx, which is cheaper
+    than joining every question.
+    """
+    active = Question.objects.filter(
+        level=OuterRef('level'), month=OuterRef('pk'), is_active=True,
+    ).order_by().values('month').annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(active), 0)
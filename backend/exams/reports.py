@@ -0,0 +1,169 @@
+"""
+Teacher performance reports (PerformanceRollup).
+Completing an exam adds its percentage, overall and per category, to the
+rollup rows of its teacher, level and month in the same transaction;
+deleting it takes them back out. Reports sum rollup rows only, so their
+cost depends on the number of teachers, months and categories, never on
+how many exams have been taken. rebuild_reports() recomputes every row
+from the stored answers.
+"""
+from collections import defaultdict
+from django.db.models import F, Sum
+from .models import Category, PerformanceRollup, Answer
+
+
+# Ids each grouping sums over, the columns of its label and its order
+REPORT_GROUPS = {
+    'teacher': (['teacher_id'], ['teacher__first_name', 'teacher__last_name'],
+                ['teacher__last_name', 'teacher__first_name', 'teacher_id']),
+    'level': (['level_id'], ['level__name'], ['level__order', 'level_id']),
+    'month': (['level_id', 'month_id'], ['level__name', 'month__name'],
+              ['level__order', 'month__number', 'month_id']),
+}
+LABEL_SEPARATORS = {'teacher': ' ', 'level': '', 'month': ' — '}
+SUM_FIELDS = ['exams', 'pct_total'] + PerformanceRollup.BAND_FIELDS
+
+
+def exam_scores(answers):
+    """
+    Percentage of the whole exam (key None) and of each category in it
+    (key category_id), from answers with their questions loaded.
+    """
+    earned, maximum = defaultdict(float), defaultdict(float)
+    for ans in answers:
+        for key in (None, ans.question.category_id):
+            earned[key] += ans.points_earned
+            maximum[key] += ans.question.points
+    return {key: earned[key] * 100 / maximum[key] for key in maximum if maximum[key] > 0}
+
+
+def record_report(exam, answers, sign=1):
+    """
+    Add a completed exam to its teacher's rollups, or with sign=-1 remove
+    it. Call it inside the transaction that completes or deletes the exam.
+    """
+    scores = exam_scores(answers)
+    if not scores:
+        return
+    keys = {'teacher_id': exam.student.teacher_id, 'level_id': exam.level_id, 'month_id': exam.month_id}
+    if sign > 0:
+        PerformanceRollup.objects.bulk_create(
+            [PerformanceRollup(category_id=category_id, **keys) for category_id in scores],
+            ignore_conflicts=True,
+        )
+    # Locked in primary key order, so concurrent submits cannot deadlock
+    rows = list(PerformanceRollup.objects.select_for_update().filter(**keys).order_by('pk'))
+    for row in rows:
+        if row.category_id in scores:
+            row.add(scores[row.category_id], sign)
+    # A row left without exams goes, rather than report 0 exams at 0%
+    empty = [row.pk for row in rows if row.exams <= 0]
+    if empty:
+        PerformanceRollup.objects.filter(pk__in=empty).delete()
+    PerformanceRollup.objects.bulk_update([row for row in rows if row.exams > 0], SUM_FIELDS + ['updated_at'])
+
+
+def rebuild_reports(batch_size=2000):
+    """
+    Recompute every rollup from the answers of completed exams with one
+    GROUP BY query. Returns the number of rollup rows.
+    """
+    per_category = Answer.objects.filter(exam_session__is_completed=True).order_by().values(
+        'exam_session_id', 'question__category_id',
+        teacher_id=F('exam_session__student__teacher_id'),
+        level_id=F('exam_session__level_id'),
+        month_id=F('exam_session__month_id'),
+    ).annotate(earned=Sum('points_earned'), maximum=Sum('question__points'))
+
+    rows = {}
+    exams = {}
+
+    def add(keys, category_id, earned, maximum):
+        if maximum > 0:
+            key = keys + (category_id,)
+            if key not in rows:
+                rows[key] = PerformanceRollup(
+                    teacher_id=keys[0], level_id=keys[1], month_id=keys[2], category_id=category_id,
+                )
+            rows[key].add(earned * 100 / maximum)
+
+    for row in per_category.iterator():
+        keys = (row['teacher_id'], row['level_id'], row['month_id'])
+        add(keys, row['question__category_id'], row['earned'] or 0, row['maximum'] or 0)
+        total = exams.setdefault(row['exam_session_id'], [keys, 0, 0])
+        total[1] += row['earned'] or 0
+        total[2] += row['maximum'] or 0
+    for keys, earned, maximum in exams.values():
+        add(keys, None, earned, maximum)
+
+    PerformanceRollup.objects.all().delete()
+    PerformanceRollup.objects.bulk_create(rows.values(), batch_size=batch_size)
+    return len(rows)
+
+
+def summarize(row):
+    """Exam count, mean percentage and bands of a group of summed rollup rows."""
+    exams = row['exams'] or 0
+    line = {'exams': exams, 'mean_pct': round(row['pct_total'] / exams, 1) if exams else 0}
+    line.update({field: row[field] or 0 for field in PerformanceRollup.BAND_FIELDS})
+    return line
+
+
+def performance_report(group='teacher', teacher_id=None, level_id=None, month_id=None):
+    """
+    Report rows for one grouping ('teacher', 'level' or 'month'), optionally
+    narrowed to a teacher, level or month. Every row has the ids of its
+    group, a label, the exam count, the mean percentage, the bands and a
+    'categories' list, parallel to the returned categories, of the same
+    figures per category (None where it has no answers). Two GROUP BY
+    queries over the rollups and one for the category names.
+    Returns (categories, rows).
+    """
+    ids, labels, order = REPORT_GROUPS[group]
+    rollups = PerformanceRollup.objects.order_by()
+    if teacher_id:
+        rollups = rollups.filter(teacher_id=teacher_id)
+    if level_id:
+        rollups = rollups.filter(level_id=level_id)
+    if month_id:
+        rollups = rollups.filter(month_id=month_id)
+    sums = {field: Sum(field) for field in SUM_FIELDS}
+
+    rows = {}
+    for row in rollups.filter(category__isnull=True).values(*ids, *labels).annotate(**sums).order_by(*order):
+        line = {field: row[field] for field in ids}
+        line['label'] = LABEL_SEPARATORS[group].join(row[field] for field in labels)
+        line.update(summarize(row))
+        rows[tuple(row[field] for field in ids)] = line
+
+    per_category = {}
+    for row in rollups.filter(category__isnull=False).values(*ids, 'category_id').annotate(**sums):
+        per_category[tuple(row[field] for field in ids) + (row['category_id'],)] = summarize(row)
+
+    categories = list(Category.objects.filter(
+        pk__in={key[-1] for key in per_category},
+    ).order_by('order', 'name'))
+    for key, line in rows.items():
+        line['categories'] = [per_category.get(key + (c.pk,)) for c in categories]
+    return categories, list(rows.values())
+
+
+def report_params(query):
+    """Grouping and filters of a report request, from its query string."""
+    params = {'group': query.get('group', 'teacher')}
+    if params['group'] not in REPORT_GROUPS:
+        params['group'] = 'teacher'
+    for name in ('teacher', 'level', 'month'):
+        value = query.get(name, '')
+        params[name] = value if value.isdigit() else ''
+    return params
+
+
+def report_for(params):
+    """performance_report() of the params report_params() returns."""
+    return performance_report(
+        params['group'],
+        teacher_id=int(params['teacher'] or 0) or None,
+        level_id=int(params['level'] or 0) or None,
+        month_id=int(params['month'] or 0) or None,
+    )
@@ -0,0 +1,53 @@
+from functools import partial
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .catalogue import SETTINGS_VERSION_KEY, TEACHERS_VERSION_KEY, bump_version
+from .dashboard import invalidate_stats
+from .db import apply_sqlite_pragmas
+from .models import (
+    SiteSettings, Teacher, Level, Month, Category, Question, VocabularyWord, ExamSession,
+)
+from .item_stats import record_item_stats
+from .reports import record_report
+
+
+@receiver([post_save, post_delete], sender=Level)
+@receiver([post_save, post_delete], sender=Month)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=VocabularyWord)
+def catalogue_changed(sender, **kwargs):
+    # After the commit, or another worker could cache the old rows under the new version
+    transaction.on_commit(bump_version)
+
+
+@receiver([post_save, post_delete], sender=SiteSettings)
+def site_settings_changed(sender, **kwargs):
+    transaction.on_commit(partial(bump_version, SETTINGS_VERSION_KEY))
+
+
+@receiver([post_save, post_delete], sender=Teacher)
+def teachers_changed(sender, **kwargs):
+    transaction.on_commit(partial(bump_version, TEACHERS_VERSION_KEY))
+
+
+@receiver([post_save, post_delete], sender=Teacher)
+@receiver([post_save, post_delete], sender=Level)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Question)
+def dashboard_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_stats)
+
+
+@receiver(pre_delete, sender=ExamSession)
+def exam_deleted(sender, instance, **kwargs):
+    # Before the delete cascades to the answers the exam's share is read from
+    if instance.is_completed:
+        answers = list(instance.answers.select_related('question'))
+        record_item_stats(answers, sign=-1)
+        record_report(instance, answers, sign=-1)
+
+
+connection_created.connect(apply_sqlite_pragmas)
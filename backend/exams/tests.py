@@ -0,0 +1,526 @@
+import json
+import random
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+from .models import (
+    SiteSettings, Teacher, Level, Month, Category, Question, VocabularyWord,
+    Student, ExamSession, Answer, QuestionStats, PerformanceRollup,
+)
+from .ai_cache import detection_cache
+from .ai_detector import detect_ai_text
+from .ai_drafts import DraftConflict, apply_update
+from .ai_verdicts import score_stale_verdicts
+from .dashboard import compute_stats
+from .grading import ABANDONED_AFTER, ExamAlreadySubmitted, grade_answers, upsert_answers
+from .item_stats import rebuild_item_stats
+from .reports import rebuild_reports
+
+
+# Django's own admin is not routed in production; AdminChangelistQueryTests mounts it here
+urlpatterns = [path('dj/', admin.site.urls), path('', include('exam_site.urls'))]
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def stats_snapshot():
+    """Item statistics and report rollups, to compare against a rebuild."""
+    return (
+        list(QuestionStats.objects.order_by('question_id').values_list(
+            'question_id', 'attempts', 'correct', 'option_counts',
+        )),
+        list(PerformanceRollup.objects.order_by('category_id').values_list(
+            'category_id', 'exams', *PerformanceRollup.BAND_FIELDS,
+        )),
+    )
+
+
+def make_catalogue(num_levels, num_months, prefix='level', questions_per_month=2):
+    """Levels with months, each month with questions of one category and a word."""
+    category = Category.objects.get_or_create(name='Grammar', slug='grammar')[0]
+    levels = []
+    for i in range(num_levels):
+        level = Level.objects.create(name=f'{prefix} {i}', slug=f'{prefix}-{i}', order=i)
+        for n in range(1, num_months + 1):
+            month = Month.objects.create(level=level, number=n, name=f'{n}-oy')
+            for k in range(questions_per_month):
+                Question.objects.create(
+                    level=level, month=month, category=category,
+                    question_type='multiple_choice', question_text=f'Q{k}',
+                    options=['a', 'b', 'c'], correct_answer_index=k % 3, order=k,
+                )
+            VocabularyWord.objects.create(level=level, month=month, word=f'word {n}')
+        levels.append(level)
+    return levels
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class CatalogueQueryCountTests(TestCase):
+    """The level and month APIs cost the same few queries however big the catalogue is."""
+
+    def get(self, url):
+        # A fresh cache each time, so the payload is built from the database
+        cache.clear()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_levels_query_count_is_constant(self):
+        make_catalogue(1, 1)
+        with self.assertNumQueries(1):
+            self.get('/api/levels/')
+        make_catalogue(5, 3, prefix='extra')
+        with self.assertNumQueries(1):
+            data = self.get('/api/levels/')
+        self.assertEqual(len(data['levels']), 6)
+
+    def test_months_query_count_is_constant(self):
+        small = make_catalogue(1, 1, prefix='small')[0]
+        large = make_catalogue(1, 8, prefix='large')[0]
+        with self.assertNumQueries(2):
+            self.get(f'/api/levels/{small.slug}/months/')
+        with self.assertNumQueries(2):
+            data = self.get(f'/api/levels/{large.slug}/months/')
+        self.assertEqual(len(data['months']), 8)
+        self.assertEqual({m['question_count'] for m in data['months']}, {2})
+        self.assertEqual({m['vocab_count'] for m in data['months']}, {1})
+
+
+def make_results(level, month, num_teachers, students_per_teacher, exams_per_student=1):
+    """Teachers with students, each student with completed exams of one month, answered in full."""
+    questions = list(month.questions.all())
+    for t in range(num_teachers):
+        teacher = Teacher.objects.create(first_name=f'Teacher{t}', last_name=f'{level.slug}-{month.number}')
+        for s in range(students_per_teacher):
+            student = Student.objects.create(first_name=f'Student{s}', last_name=teacher.last_name, teacher=teacher)
+            for e in range(exams_per_student):
+                exam = ExamSession.objects.create(
+                    student=student, level=level, month=month,
+                    session_id=f'{student.pk}-{e}', is_completed=True,
+                    total_score=e % 3, max_score=2,
+                )
+                Answer.objects.bulk_create([
+                    Answer(exam_session=exam, question=q, answer_index=e % 3,
+                           is_correct=e % 3 == q.correct_answer_index, points_earned=e % 3 == q.correct_answer_index)
+                    for q in questions
+                ])
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class PanelQueryCountTests(TestCase):
+    """Every admin panel list costs the same queries for one row as for several pages."""
+
+    # Session and user lookups included
+    PAGES = {
+        '/admin/': 5,
+        '/admin/levels/': 5,
+        '/admin/months/': 5,
+        '/admin/questions/': 9,
+        '/admin/categories/': 4,
+        '/admin/exams/': 6,
+        '/admin/students/': 5,
+        '/admin/teachers/': 5,
+        '/admin/reports/': 9,
+    }
+
+    def setUp(self):
+        SiteSettings.load()
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+
+    def assert_page_queries(self):
+        for url, num in self.PAGES.items():
+            cache.clear()
+            with self.subTest(url=url), self.assertNumQueries(num):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_panel_query_counts_are_constant(self):
+        level = make_catalogue(1, 1, prefix='one')[0]
+        make_results(level, level.months.get(), 1, 1)
+        self.assert_page_queries()
+
+        level = make_catalogue(3, 4, prefix='many')[0]
+        make_results(level, level.months.first(), 5, 12, exams_per_student=2)
+        self.assert_page_queries()
+
+    def test_dashboard_shows_detection_cache_counters(self):
+        detection_cache.clear()
+        for _ in range(3):
+            detect_ai_text(ExamSessionApiTests.AI_TEXT)
+        ai_cache = self.client.get('/admin/').context['ai_cache']
+        self.assertEqual((ai_cache['hits'], ai_cache['misses'], ai_cache['size']), (2, 1, 1))
+
+    def test_teacher_filter_options_are_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Teacher.objects.create(first_name='Cached', last_name='Teacher')
+        self.client.get('/admin/exams/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/exams/')
+        self.assertFalse([q for q in queries if 'FROM "exams_teacher"' in q['sql']])
+        self.assertContains(response, 'Cached Teacher')
+        with self.captureOnCommitCallbacks(execute=True):
+            Teacher.objects.create(first_name='Added', last_name='Teacher')
+            # The version moves on commit only
+            self.assertNotContains(self.client.get('/admin/exams/'), 'Added Teacher')
+        self.assertContains(self.client.get('/admin/exams/'), 'Added Teacher')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/reports/')
+        self.assertFalse([q for q in queries if 'FROM "exams_teacher"' in q['sql']])
+        self.assertContains(response, 'Added Teacher')
+
+
+@override_settings(CACHES=LOCAL_CACHE, ROOT_URLCONF='exams.tests')
+class AdminChangelistQueryTests(TestCase):
+    """Django admin changelists cost a small, fixed number of queries per page."""
+
+    MAX_QUERIES = 10
+
+    def setUp(self):
+        SiteSettings.load()
+        self.client.force_login(User.objects.create_superuser('root', password='x'))
+        self.client.get('/dj/')
+
+    def changelist_queries(self):
+        counts = {}
+        for model in admin.site._registry:
+            if model._meta.app_label != 'exams':
+                continue
+            url = f'/dj/exams/{model._meta.model_name}/'
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            counts[url] = len(queries)
+        return counts
+
+    def test_changelist_query_counts_are_capped(self):
+        level = make_catalogue(1, 1, prefix='one')[0]
+        make_results(level, level.months.get(), 1, 1)
+        few = self.changelist_queries()
+
+        level = make_catalogue(2, 3, prefix='many')[0]
+        make_results(level, level.months.first(), 4, 10, exams_per_student=2)
+        many = self.changelist_queries()
+
+        self.assertEqual(few, many)
+        for url, num in many.items():
+            self.assertLessEqual(num, self.MAX_QUERIES, url)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class UnfinishedExamTests(TestCase):
+    """Exams still being taken are not counted as results, and abandoned ones are deleted."""
+
+    def setUp(self):
+        level = make_catalogue(1, 1)[0]
+        make_results(level, level.months.get(), 1, 1)
+        self.student = Student.objects.get()
+        self.open = ExamSession.objects.create(
+            student=self.student, level=level, month=level.months.get(), session_id='open',
+        )
+        self.abandoned = ExamSession.objects.create(
+            student=self.student, level=level, month=level.months.get(), session_id='abandoned',
+        )
+        ExamSession.objects.filter(pk=self.abandoned.pk).update(
+            started_at=timezone.now() - ABANDONED_AFTER - timedelta(minutes=1),
+        )
+
+    def test_unfinished_exams_are_not_listed(self):
+        stats = compute_stats()
+        self.assertEqual(stats['total_exams'], 1)
+        self.assertEqual([e.session_id for e in stats['recent_exams']], [f'{self.student.pk}-0'])
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        self.assertEqual(len(self.client.get('/admin/exams/').context['exams']), 1)
+        self.assertEqual(self.client.get('/admin/students/').context['students'][0].num_exams, 1)
+
+    def test_abandoned_exams_are_deleted(self):
+        call_command('clear_abandoned_exams', stdout=StringIO())
+        self.assertEqual(
+            set(ExamSession.objects.values_list('session_id', flat=True)),
+            {f'{self.student.pk}-0', 'open'},
+        )
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ExamSessionApiTests(TestCase):
+    """Starting, autosaving and finishing an exam, including the races around finishing."""
+
+    AI_TEXT = (
+        'Furthermore, it is important to note that technology plays a crucial role. '
+        'Moreover, it is essential to understand the comprehensive transformation of society.'
+    )
+    HUMAN_TEXT = "I think my school is ok. We play football after lessons and i don't get tired lol."
+
+    def setUp(self):
+        self.level = make_catalogue(1, 1, questions_per_month=3)[0]
+        month = self.level.months.get()
+        self.mc = list(month.questions.order_by('order'))
+        self.writing = Question.objects.create(
+            level=self.level, month=month, category=Category.objects.get(),
+            question_type='writing', question_text='Essay', order=9,
+        )
+        teacher = Teacher.objects.create(first_name='Session', last_name='Teacher')
+        self.student = Student.objects.create(first_name='Session', last_name='Student', teacher=teacher)
+
+    def post(self, url, body, content_type='application/json'):
+        return self.client.post(url, json.dumps(body), content_type=content_type)
+
+    def start(self):
+        response = self.post('/api/exam/start/', {
+            'student_id': self.student.pk, 'level_slug': self.level.slug, 'month_number': 1,
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.json()['session_id']
+
+    def autosave(self, session_id, answers, content_type='application/json'):
+        return self.post(f'/api/exam/{session_id}/answers/', {'answers': answers}, content_type)
+
+    def finish(self, session_id, answers=None):
+        return self.post('/api/submit-exam/', {'session_id': session_id, 'answers': answers or {}})
+
+    def assertStatsMatchRebuild(self):
+        incremental = stats_snapshot()
+        rebuild_item_stats()
+        rebuild_reports()
+        self.assertEqual(incremental, stats_snapshot())
+
+    def test_autosave_and_finish(self):
+        session_id = self.start()
+        mc = [str(q.pk) for q in self.mc]
+        self.assertEqual(self.autosave(session_id, {mc[0]: 0, mc[1]: 0}).json()['saved'], 2)
+        # The page-close beacon sends its JSON as text/plain
+        self.assertEqual(self.autosave(session_id, {mc[1]: 1, mc[2]: 0}, 'text/plain').status_code, 200)
+
+        progress = self.client.get(f'/api/exam/{session_id}/').json()
+        self.assertEqual(progress['answers'], {mc[0]: 0, mc[1]: 1, mc[2]: 0})
+        self.assertFalse(progress['is_completed'])
+
+        response = self.finish(session_id, {str(self.writing.pk): self.AI_TEXT})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['score']['points'], 2)
+        self.assertEqual(response.json()['score']['maxPoints'], 4)
+        exam = ExamSession.objects.get(session_id=session_id)
+        self.assertTrue(exam.is_completed)
+        self.assertEqual((exam.total_score, exam.max_score), (2, 4))
+        essay = exam.answers.get(question=self.writing)
+        self.assertEqual(essay.ai_score, detect_ai_text(self.AI_TEXT)['score'])
+        self.assertStatsMatchRebuild()
+
+    def test_writes_after_finish_conflict(self):
+        session_id = self.start()
+        self.autosave(session_id, {str(self.mc[0].pk): 0})
+        self.assertEqual(self.finish(session_id).status_code, 200)
+
+        self.assertEqual(self.finish(session_id).status_code, 409)
+        self.assertEqual(self.autosave(session_id, {str(self.mc[1].pk): 1}).status_code, 409)
+        self.assertEqual(self.autosave(session_id, {str(self.mc[1].pk): 1}, 'text/plain').status_code, 409)
+        # An autosave that passed the view's check before the exam was finished
+        exam = ExamSession.objects.get(session_id=session_id)
+        with self.assertRaises(ExamAlreadySubmitted):
+            upsert_answers(exam, grade_answers({str(self.mc[1].pk): 1}, check_ai=False)[0])
+
+        self.assertEqual(exam.answers.count(), 1)
+        self.assertEqual(PerformanceRollup.objects.get(category=None).exams, 1)
+        self.assertStatsMatchRebuild()
+
+    def test_autosave_during_finish_is_totalled(self):
+        session_id = self.start()
+        mc, essay = str(self.mc[1].pk), str(self.writing.pk)
+        self.autosave(session_id, {mc: 0, essay: self.AI_TEXT})
+        landed = []
+
+        def score_then_autosave(answers):
+            # The autosave lands after the verdicts are scored, before finishing takes the lock
+            scored = score_stale_verdicts(answers)
+            if not landed:
+                landed.append(self.autosave(session_id, {mc: 1, essay: self.HUMAN_TEXT}).status_code)
+            return scored
+
+        with mock.patch('exams.grading.score_stale_verdicts', side_effect=score_then_autosave):
+            response = self.finish(session_id)
+        self.assertEqual(landed, [200])
+        self.assertEqual(response.status_code, 200)
+        exam = ExamSession.objects.get(session_id=session_id)
+        self.assertEqual((exam.total_score, exam.max_score), (1, 2))
+        essay_answer = exam.answers.get(question=self.writing)
+        self.assertEqual(essay_answer.answer_text, self.HUMAN_TEXT)
+        self.assertEqual(essay_answer.ai_score, detect_ai_text(self.HUMAN_TEXT)['score'])
+        self.assertStatsMatchRebuild()
+
+    def test_concurrent_finish_conflicts(self):
+        session_id = self.start()
+        self.autosave(session_id, {str(self.mc[0].pk): 0})
+        other = []
+
+        def score_then_finish(answers):
+            # Another submit of the same exam finishes it while this one scores
+            scored = score_stale_verdicts(answers)
+            if not other:
+                other.append(None)  # The other submit scores through this mock too
+                other[0] = self.finish(session_id).status_code
+            return scored
+
+        with mock.patch('exams.grading.score_stale_verdicts', side_effect=score_then_finish):
+            response = self.finish(session_id)
+        self.assertEqual(other, [200])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(PerformanceRollup.objects.get(category=None).exams, 1)
+        self.assertStatsMatchRebuild()
+
+
+@override_settings(CACHES=LOCAL_CACHE, SQLITE_TUNING=True)
+class ConcurrentSubmitTests(TransactionTestCase):
+    """Parallel submits on one SQLite file: one submit per exam succeeds and is counted once."""
+
+    WORKERS = 50
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('needs a file-backed test database')
+        self.level = make_catalogue(1, 1, questions_per_month=10)[0]
+        self.questions = list(Question.objects.all())
+        teacher = Teacher.objects.create(first_name='Parallel', last_name='Teacher')
+        self.students = [
+            Student.objects.create(first_name=f'Student{i}', last_name='Parallel', teacher=teacher)
+            for i in range(self.WORKERS)
+        ]
+
+    def answers(self, i, questions):
+        return {str(q.pk): (i + q.pk) % 3 for q in questions}
+
+    def post(self, i, url, body, start, results):
+        try:
+            start.wait()
+            response = self.client_class().post(url, json.dumps(body), content_type='application/json')
+            results[i] = (response.status_code, response.json().get('error'))
+        finally:
+            connections.close_all()
+
+    def post_in_parallel(self, requests):
+        """POST every (url, body) from its own thread at once; returns (status, error) of each."""
+        start = threading.Barrier(len(requests))
+        results = [None] * len(requests)
+        threads = [
+            threading.Thread(target=self.post, args=(i, url, body, start, results))
+            for i, (url, body) in enumerate(requests)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def assertStatsMatchRebuild(self):
+        self.assertEqual(ExamSession.objects.filter(is_completed=True).count(), self.WORKERS)
+        incremental = stats_snapshot()
+        rebuild_item_stats()
+        rebuild_reports()
+        self.assertEqual(incremental, stats_snapshot())
+
+    def test_parallel_submits(self):
+        results = self.post_in_parallel([
+            ('/api/submit-exam/', {
+                'student_id': student.pk,
+                'level_slug': self.level.slug,
+                'month_number': 1,
+                'answers': self.answers(i, self.questions),
+            })
+            for i, student in enumerate(self.students)
+        ])
+        self.assertEqual(results, [(200, None)] * self.WORKERS)
+        self.assertStatsMatchRebuild()
+
+    def test_parallel_session_submits(self):
+        # Autosaved exams, each finished by two submits racing each other
+        half = len(self.questions) // 2
+        requests = []
+        for i, student in enumerate(self.students):
+            session_id = self.client.post('/api/exam/start/', json.dumps({
+                'student_id': student.pk, 'level_slug': self.level.slug, 'month_number': 1,
+            }), content_type='application/json').json()['session_id']
+            self.client.post(
+                f'/api/exam/{session_id}/answers/',
+                json.dumps({'answers': self.answers(i, self.questions[:half])}),
+                content_type='application/json',
+            )
+            body = {'session_id': session_id, 'answers': self.answers(i, self.questions[half:])}
+            requests += [('/api/submit-exam/', body)] * 2
+
+        results = self.post_in_parallel(requests)
+        for i in range(self.WORKERS):
+            self.assertEqual(
+                sorted(results[2 * i:2 * i + 2], key=str),
+                [(200, None), (409, 'Exam already submitted')],
+            )
+        for exam in ExamSession.objects.all():
+            self.assertEqual(exam.max_score, len(self.questions))
+            self.assertEqual(exam.answers.count(), len(self.questions))
+        self.assertStatsMatchRebuild()
+
+
+class AiDraftTests(SimpleTestCase):
+    """Live draft checks score every revision exactly like detect_ai_text of the whole text."""
+
+    PIECES = [
+        'Furthermore, ', 'it is important to note', ' that ', 'technology ', '. ', '!', '?', '\n', '\n\n',
+        '1. ', '2.', '\n- ', 'a) ', '  ', 'lol ', "don't ", 'In conclusion, we see. ', 'word ',
+        'Moreover the comprehensive transformation ', 'ok', '\t', '-', '\u2022', 'b.', '12)', 'x',
+        '\n3.', '\n1. We wrote a long answer about our school and friends',
+    ]
+
+    def test_deltas_match_full_detection(self):
+        rnd = random.Random(6)
+        for draft in range(20):
+            draft_id = f'test-draft-{draft}'
+            text = ''.join(rnd.choice(self.PIECES) for _ in range(rnd.randint(0, 60)))
+            rev, result = apply_update(draft_id, {'text': text})
+            self.assertEqual(result, detect_ai_text(text))
+            for _ in range(40):
+                start = rnd.randint(0, len(text))
+                end = rnd.randint(start, min(len(text), start + rnd.choice([0, 1, 5, 50])))
+                inserted = ''.join(rnd.choice(self.PIECES) for _ in range(rnd.choice([0, 1, 1, 3])))
+                text = text[:start] + inserted + text[end:]
+                rev, result = apply_update(draft_id, {'rev': rev, 'start': start, 'end': end, 'text': inserted})
+                self.assertEqual(result, detect_ai_text(text), text)
+
+    def test_typing_matches_full_detection(self):
+        essay = (
+            'In conclusion, technology plays a crucial role in education today.\n'
+            'Furthermore it is important to note that students learn faster with it.\n\n'
+            '1. Computers help us find information quickly and easily every day\n'
+            '2.\n'
+            'b) Moreover teachers use comprehensive online materials in lessons\n'
+            '3.'
+        )
+        rev, _ = apply_update('test-draft-typing', {'text': ''})
+        text = ''
+        for word in essay.split(' '):
+            inserted = word if not text else ' ' + word
+            rev, result = apply_update(
+                'test-draft-typing', {'rev': rev, 'start': len(text), 'end': len(text), 'text': inserted},
+            )
+            text += inserted
+            self.assertEqual(result, detect_ai_text(text), text)
+        while text:
+            start = len(text) // 3
+            end = min(len(text), start + 7)
+            rev, result = apply_update('test-draft-typing', {'rev': rev, 'start': start, 'end': end, 'text': ''})
+            text = text[:start] + text[end:]
+            self.assertEqual(result, detect_ai_text(text), text)
+
+    def test_stale_revision_asks_for_the_full_text(self):
+        rev, _ = apply_update('test-draft-stale', {'text': 'Hello there'})
+        apply_update('test-draft-stale', {'rev': rev, 'start': 5, 'end': 5, 'text': '!'})
+        with self.assertRaises(DraftConflict):
+            apply_update('test-draft-stale', {'rev': rev, 'start': 0, 'end': 0, 'text': 'x'})
+        with self.assertRaises(DraftConflict):
+            apply_update('test-draft-unknown', {'rev': 1, 'start': 0, 'end': 0, 'text': 'x'})
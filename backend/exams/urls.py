@@ -10,7 +10,14 @@ urlpatterns = [
     path('levels/<slug:level_slug>/months/<int:month_number>/vocabulary/',
          views.get_vocabulary, name='vocabulary'),
     path('submit-exam/', views.submit_exam, name='submit_exam'),
+    path('exam/start/', views.start_exam, name='start_exam'),
+    path('exam/<str:session_id>/', views.get_exam_progress, name='exam_progress'),
+    path('exam/<str:session_id>/answers/', views.save_exam_answers, name='save_exam_answers'),
     path('check-ai/', views.check_ai, name='check_ai'),
+    path('check-ai/batch/', views.check_ai_batch, name='check_ai_batch'),
+    path('check-ai/draft/', views.check_ai_draft, name='check_ai_draft'),
     path('site-settings/', views.get_site_settings, name='site_settings'),
+    path('bootstrap/', views.bootstrap, name='bootstrap'),
+    path('reports/', views.performance_reports, name='performance_reports'),
 ]
 
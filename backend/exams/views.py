@@ -1,150 +1,27 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.shortcuts import render, get_object_or_404
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 import json
 import uuid
-import re
-import math
-from .models import (
-    SiteSettings, Teacher, Level, Month, Category, Question,
-    VocabularyWord, Student, ExamSession, Answer
+from .models import Teacher, Level, Month, VocabularyWord, Student, ExamSession, Answer
+from .ai_detector import detect_ai_text
+from .ai_drafts import apply_update, DraftConflict
+from .ai_verdicts import rescore_answers
+from .catalogue import (
+    SETTINGS_VERSION_KEY, bootstrap_payload, exam_payload, level_info, level_list,
+    month_lists, settings_data, site_settings, versioned,
 )
+from .grading import (
+    ExamAlreadySubmitted, grade_answers, save_exam, build_review, finish_exam, upsert_answers,
+    delete_abandoned_exams,
+)
+from .reports import report_for, report_params
 
 
-AI_PHRASES = [
-    'it is important to note', 'it is worth noting', 'in conclusion',
-    'furthermore', 'moreover', 'additionally', 'in today\'s world',
-    'in today\'s society', 'plays a crucial role', 'plays a vital role',
-    'it is essential to', 'on the other hand', 'in summary',
-    'as a result', 'consequently', 'nevertheless', 'nonetheless',
-    'in light of', 'with regard to', 'in terms of',
-    'it can be argued', 'one could argue', 'it goes without saying',
-    'last but not least', 'to sum up', 'all in all',
-    'taking everything into consideration', 'from my perspective',
-    'in my opinion', 'first and foremost', 'significantly',
-    'fundamentally', 'transforming how', 'rapidly shaping',
-    'undeniably', 'indispensable', 'paramount', 'multifaceted',
-    'delve into', 'tapestry', 'landscape of',
-    'navigating the', 'ever-evolving', 'harness the power',
-    'pave the way', 'shed light on', 'foster a sense of',
-    'a testament to', 'serves as a', 'it is imperative',
-    'encompasses a wide range', 'strikes a balance',
-    'holistic approach', 'nuanced understanding',
-    'artificial intelligence is rapidly', 'the future of humanity',
-    'from healthcare to education', 'transforming how people',
-    'intelligent machines', 'reshaping the way',
-    'revolutionizing', 'pivotal role', 'profound impact',
-]
-
-AI_PHRASES_UZ = [
-    'shuni ta\'kidlash kerak', 'bugungi kunda', 'xulosa qilib aytganda',
-    'bundan tashqari', 'shuningdek', 'qo\'shimcha ravishda',
-    'zamonaviy dunyoda', 'muhim rol o\'ynaydi', 'hal qiluvchi ahamiyatga ega',
-    'boshqa tomondan', 'natijada', 'shunga qaramay',
-    'fikrimcha', 'eng avvalo', 'sezilarli darajada',
-    'o\'z navbatida', 'shubhasiz', 'ta\'kidlash joiz',
-    'yakunlab aytganda', 'umuman olganda',
-]
-
-
-def detect_ai_text(text):
-    if not text or len(text.strip()) < 30:
-        return {'is_ai': False, 'score': 0, 'reasons': []}
-
-    text_lower = text.lower().strip()
-    words = text_lower.split()
-    word_count = len(words)
-    if word_count < 10:
-        return {'is_ai': False, 'score': 0, 'reasons': []}
-
-    score = 0
-    reasons = []
-
-    # 1. Check AI-typical phrases (EN + UZ)
-    phrase_hits = 0
-    for phrase in AI_PHRASES + AI_PHRASES_UZ:
-        if phrase in text_lower:
-            phrase_hits += 1
-    if phrase_hits >= 3:
-        score += 35
-        reasons.append(f'{phrase_hits} ta AI-tipik ibora topildi')
-    elif phrase_hits >= 2:
-        score += 20
-        reasons.append(f'{phrase_hits} ta AI-tipik ibora topildi')
-    elif phrase_hits >= 1:
-        score += 8
-
-    # 2. Sentence uniformity (AI writes very uniform sentence lengths)
-    sentences = re.split(r'[.!?]+', text_lower)
-    sentences = [s.strip() for s in sentences if len(s.strip()) > 5]
-    if len(sentences) >= 3:
-        lengths = [len(s.split()) for s in sentences]
-        avg_len = sum(lengths) / len(lengths)
-        variance = sum((l - avg_len) ** 2 for l in lengths) / len(lengths)
-        std_dev = math.sqrt(variance) if variance > 0 else 0
-        cv = std_dev / avg_len if avg_len > 0 else 0
-        if cv < 0.25 and avg_len > 8:
-            score += 20
-            reasons.append('Gaplar uzunligi juda bir xil (AI belgisi)')
-        elif cv < 0.35 and avg_len > 10:
-            score += 10
-
-    # 3. Excessive transition words
-    transitions = ['however', 'moreover', 'furthermore', 'additionally',
-                   'consequently', 'nevertheless', 'therefore', 'thus',
-                   'hence', 'meanwhile', 'subsequently', 'accordingly',
-                   'biroq', 'shuningdek', 'bundan tashqari', 'natijada',
-                   'shuning uchun', 'demak', 'binobarin']
-    trans_count = sum(1 for t in transitions if t in text_lower)
-    trans_ratio = trans_count / max(len(sentences), 1)
-    if trans_ratio > 0.5 and trans_count >= 3:
-        score += 15
-        reasons.append(f"{trans_count} ta bog'lovchi so'z (ko'p)")
-    elif trans_ratio > 0.3 and trans_count >= 2:
-        score += 8
-
-    # 4. Paragraph structure too perfect (similar paragraph lengths)
-    paragraphs = [p.strip() for p in text.split('\n') if len(p.strip()) > 20]
-    if len(paragraphs) >= 3:
-        p_lens = [len(p.split()) for p in paragraphs]
-        p_avg = sum(p_lens) / len(p_lens)
-        p_var = sum((l - p_avg) ** 2 for l in p_lens) / len(p_lens)
-        p_cv = math.sqrt(p_var) / p_avg if p_avg > 0 else 0
-        if p_cv < 0.2:
-            score += 15
-            reasons.append('Paragraflar uzunligi juda bir xil')
-
-    # 5. High vocabulary diversity with long words (AI uses complex vocab)
-    unique_words = set(re.findall(r'[a-zA-Z]+', text_lower))
-    long_words = [w for w in unique_words if len(w) > 10]
-    if len(long_words) > word_count * 0.08 and word_count > 30:
-        score += 12
-        reasons.append(f"{len(long_words)} ta murakkab so'z ishlatilgan")
-
-    # 6. Too few spelling/grammar mistakes (humans make errors)
-    if word_count > 50:
-        contractions = text.count("'") + text.count("'")
-        casual_markers = sum(1 for w in words if w in ['ok', 'yeah', 'gonna', 'wanna', 'kinda', 'ya', 'lol', 'btw'])
-        if contractions == 0 and casual_markers == 0:
-            score += 8
-
-    # 7. Numbered/lettered list patterns (AI loves lists)
-    list_patterns = len(re.findall(r'(?:^|\n)\s*(?:\d+[\.\)]\s|[a-z][\.\)]\s|[-•]\s)', text))
-    if list_patterns >= 3 and word_count > 40:
-        score += 10
-        reasons.append(f"{list_patterns} ta ro'yxat element topildi")
-
-    score = min(score, 100)
-    is_ai = score >= 40
-
-    return {
-        'is_ai': is_ai,
-        'score': score,
-        'reasons': reasons,
-        'label': 'AI yozgan' if score >= 70 else 'AI ishlatilgan bo\'lishi mumkin' if score >= 40 else 'Inson yozgan',
-    }
+MAX_BATCH_ANSWERS = 500
 
 
 @csrf_exempt
@@ -179,46 +56,21 @@ def register_student(request):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@versioned()
 def get_levels(request):
-    levels = Level.objects.filter(is_active=True)
-    data = [{
-        'id': lv.id,
-        'name': lv.name,
-        'slug': lv.slug,
-        'description': lv.description,
-        'color': lv.color,
-        'icon': lv.icon,
-        'order': lv.order,
-        'image_url': lv.image.url if lv.image else None,
-        'month_count': lv.months.filter(is_active=True).count(),
-    } for lv in levels]
-    return JsonResponse({'success': True, 'levels': data})
+    return JsonResponse({'success': True, 'levels': level_list()})
 
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@versioned()
 def get_months(request, level_slug):
     try:
         level = Level.objects.get(slug=level_slug, is_active=True)
-        months = level.months.filter(is_active=True).order_by('number')
-        data = [{
-            'id': m.id,
-            'number': m.number,
-            'name': m.name,
-            'question_count': Question.objects.filter(
-                level=level, month=m, is_active=True
-            ).count(),
-            'vocab_count': VocabularyWord.objects.filter(
-                level=level, month=m, is_active=True
-            ).count(),
-        } for m in months]
         return JsonResponse({
             'success': True,
-            'level': {
-                'id': level.id, 'name': level.name,
-                'slug': level.slug, 'color': level.color, 'icon': level.icon,
-            },
-            'months': data,
+            'level': level_info(level),
+            'months': month_lists([level]).get(level.id, []),
         })
     except Level.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Level not found'}, status=404)
@@ -228,54 +80,22 @@ def get_months(request, level_slug):
 @require_http_methods(["GET"])
 def get_questions(request, level_slug, month_number):
     try:
-        level = Level.objects.get(slug=level_slug, is_active=True)
-        month = Month.objects.get(level=level, number=month_number, is_active=True)
-
-        questions = Question.objects.filter(
-            level=level, month=month, is_active=True
-        ).select_related('category').order_by('category__order', 'order')
-
-        cats = []
-        seen = set()
-        for q in questions:
-            if q.category.slug not in seen:
-                seen.add(q.category.slug)
-                cats.append({
-                    'id': q.category.id,
-                    'name': q.category.name,
-                    'slug': q.category.slug,
-                })
-
-        questions_data = []
-        for q in questions:
-            qd = {
-                'id': q.id,
-                'category': q.category.slug,
-                'category_name': q.category.name,
-                'question_type': q.question_type,
-                'question_text': q.question_text,
-                'instructions': q.instructions,
-                'min_words': q.min_words,
-                'points': q.points,
-            }
-            if q.question_type in ('multiple_choice', 'vocabulary'):
-                qd['options'] = q.options or []
-                qd['correct_answer_index'] = q.correct_answer_index
-            questions_data.append(qd)
-
-        return JsonResponse({
-            'success': True,
-            'level': {'name': level.name, 'slug': level.slug, 'color': level.color},
-            'month': {'number': month.number, 'name': month.name},
-            'categories': cats,
-            'questions': questions_data,
-        })
+        body, etag = exam_payload(level_slug, month_number)
     except (Level.DoesNotExist, Month.DoesNotExist):
         return JsonResponse({'success': False, 'error': 'Not found'}, status=404)
 
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # Students may reuse their copy, but only after checking it is current
+    patch_cache_control(response, no_cache=True)
+    return response
+
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@versioned()
 def get_vocabulary(request, level_slug, month_number):
     try:
         level = Level.objects.get(slug=level_slug, is_active=True)
@@ -307,109 +127,89 @@ def check_ai(request):
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
+@require_http_methods(["POST"])
+def check_ai_batch(request):
+    """
+    Staff only: recompute and store the AI verdicts of writing/translation
+    answers, given as {"answer_ids": [...]} or {"session_id": "..."}, and
+    return them by answer id.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Staff only'}, status=403)
+    try:
+        data = json.loads(request.body)
+        answers = Answer.objects.all()
+        if data.get('session_id'):
+            answers = answers.filter(exam_session__session_id=data['session_id'])
+        else:
+            ids = data.get('answer_ids')
+            if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+                return JsonResponse({'success': False, 'error': 'answer_ids must be a list of ids'}, status=400)
+            if len(ids) > MAX_BATCH_ANSWERS:
+                return JsonResponse({
+                    'success': False, 'error': f'At most {MAX_BATCH_ANSWERS} answers per request'
+                }, status=400)
+            answers = answers.filter(pk__in=ids)
+        scored = rescore_answers(answers)
+        results = {
+            str(ans.pk): ans.ai_check
+            for ans in answers.filter(ai_version__isnull=False).only('pk', *Answer.AI_FIELDS)
+        }
+        return JsonResponse({'success': True, 'scored': scored, 'results': results})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
-def submit_exam(request):
+def check_ai_draft(request):
     try:
         data = json.loads(request.body)
-        student_id = data.get('student_id')
-        level_slug = data.get('level_slug')
-        month_number = data.get('month_number')
-        answers_data = data.get('answers', {})
+        rev, result = apply_update(data.get('draft_id'), data)
+        return JsonResponse({'success': True, 'rev': rev, **result})
+    except DraftConflict:
+        return JsonResponse({'success': False, 'resync': True, 'error': 'Draft out of sync'}, status=409)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
-        student = Student.objects.get(id=student_id)
-        level = Level.objects.get(slug=level_slug)
-        month = Month.objects.get(level=level, number=month_number)
 
-        session_id = str(uuid.uuid4())
-        exam = ExamSession.objects.create(
-            student=student,
-            level=level,
-            month=month,
-            session_id=session_id,
-            is_completed=True,
-            completed_at=timezone.now(),
-        )
+@csrf_exempt
+@require_http_methods(["POST"])
+def submit_exam(request):
+    try:
+        data = json.loads(request.body)
+        answers_data = data.get('answers', {})
 
-        total_score = 0
-        max_score = 0
-
-        for key, answer_value in answers_data.items():
-            try:
-                question_id = int(key)
-                question = Question.objects.get(id=question_id, is_active=True)
-                max_score += question.points
-
-                is_correct = None
-                points_earned = 0
-
-                if question.question_type in ['multiple_choice', 'vocabulary']:
-                    if (question.correct_answer_index is not None
-                            and answer_value == question.correct_answer_index):
-                        is_correct = True
-                        points_earned = question.points
-                        total_score += question.points
-                    else:
-                        is_correct = False
-
-                ai_result = None
-                if question.question_type in ['writing', 'translation'] and isinstance(answer_value, str):
-                    ai_result = detect_ai_text(answer_value)
-
-                Answer.objects.create(
-                    exam_session=exam,
-                    question=question,
-                    answer_text=str(answer_value) if not isinstance(answer_value, int) else '',
-                    answer_index=answer_value if isinstance(answer_value, int) else None,
-                    is_correct=is_correct,
-                    points_earned=points_earned,
-                )
-            except (ValueError, Question.DoesNotExist):
-                continue
-
-        exam.total_score = total_score
-        exam.max_score = max_score
-        exam.save()
-
-        review = []
-        for ans in exam.answers.select_related(
-            'question', 'question__category'
-        ).order_by('question__category__order', 'question__order'):
-            q = ans.question
-            item = {
-                'questionId': q.id,
-                'category': q.category.slug,
-                'categoryName': q.category.name,
-                'questionType': q.question_type,
-                'questionText': q.question_text,
-                'isCorrect': ans.is_correct,
-            }
-            if q.question_type in ('multiple_choice', 'vocabulary'):
-                item['options'] = q.options or []
-                item['correctIndex'] = q.correct_answer_index
-                ci = q.correct_answer_index
-                item['correctAnswer'] = (
-                    q.options[ci]
-                    if q.options and ci is not None and ci < len(q.options)
-                    else ''
-                )
-                ai_idx = ans.answer_index
-                item['yourAnswer'] = (
-                    q.options[ai_idx]
-                    if ai_idx is not None and q.options and ai_idx < len(q.options)
-                    else 'No answer'
-                )
-                item['yourIndex'] = ai_idx
-            else:
-                item['yourAnswer'] = ans.answer_text or 'No answer'
-                if q.question_type in ('writing', 'translation') and ans.answer_text:
-                    item['aiCheck'] = detect_ai_text(ans.answer_text)
-            review.append(item)
-
-        correct_count = exam.answers.filter(is_correct=True).count()
-        total_gradable = exam.answers.filter(
-            question__question_type__in=['multiple_choice', 'vocabulary']
-        ).count()
+        if data.get('session_id'):
+            # Started through the autosave API: answers are mostly saved already
+            exam = ExamSession.objects.get(session_id=data['session_id'])
+            if exam.is_completed:
+                return JsonResponse({'success': False, 'error': 'Exam already submitted'}, status=409)
+            answers, total_score, max_score = finish_exam(exam, answers_data)
+            session_id = exam.session_id
+        else:
+            student_id = data.get('student_id')
+            level_slug = data.get('level_slug')
+            month_number = data.get('month_number')
+
+            student = Student.objects.get(id=student_id)
+            level = Level.objects.get(slug=level_slug)
+            month = Month.objects.get(level=level, number=month_number)
+
+            answers, total_score, max_score = grade_answers(answers_data)
+
+            session_id = str(uuid.uuid4())
+            save_exam(
+                answers, total_score, max_score,
+                student=student,
+                level=level,
+                month=month,
+                session_id=session_id,
+                is_completed=True,
+                completed_at=timezone.now(),
+            )
+
+        review, correct_count, total_gradable = build_review(answers)
 
         return JsonResponse({
             'success': True,
@@ -426,10 +226,91 @@ def submit_exam(request):
             'review': review,
             'session_id': session_id,
         })
+    except ExamAlreadySubmitted as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=409)
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def start_exam(request):
+    """Create the in-progress ExamSession that autosaved answers attach to."""
+    try:
+        data = json.loads(request.body)
+        student = Student.objects.get(id=data.get('student_id'))
+        level = Level.objects.get(slug=data.get('level_slug'))
+        month = Month.objects.get(level=level, number=data.get('month_number'))
+        delete_abandoned_exams(student)
+        exam = ExamSession.objects.create(
+            student=student,
+            level=level,
+            month=month,
+            session_id=str(uuid.uuid4()),
+            is_completed=False,
+        )
+        return JsonResponse({
+            'success': True,
+            'session_id': exam.session_id,
+            'started_at': exam.started_at.isoformat(),
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def save_exam_answers(request, session_id):
+    """
+    Autosave: upsert the answers changed since the last save, sent as
+    {"answers": {question_id: value}}.
+    """
+    try:
+        data = json.loads(request.body)
+        answers_data = data.get('answers', {})
+        if not isinstance(answers_data, dict):
+            return JsonResponse({'success': False, 'error': 'answers must be an object'}, status=400)
+        exam = ExamSession.objects.get(session_id=session_id)
+        if exam.is_completed:
+            return JsonResponse({'success': False, 'error': 'Exam already submitted'}, status=409)
+        answers, _, _ = grade_answers(answers_data, check_ai=False)
+        upsert_answers(exam, answers)
+        return JsonResponse({'success': True, 'saved': len(answers)})
+    except ExamAlreadySubmitted as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=409)
+    except ExamSession.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Exam not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_exam_progress(request, session_id):
+    """Saved answers of an exam, so it can be resumed on any device."""
+    try:
+        exam = ExamSession.objects.select_related('student', 'level', 'month').get(session_id=session_id)
+    except ExamSession.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Exam not found'}, status=404)
+    answers = {
+        str(question_id): answer_index if answer_index is not None else answer_text
+        for question_id, answer_index, answer_text in exam.answers.values_list(
+            'question_id', 'answer_index', 'answer_text'
+        )
+    }
+    return JsonResponse({
+        'success': True,
+        'session_id': exam.session_id,
+        'student_id': exam.student_id,
+        'student_name': exam.student.full_name,
+        'level_slug': exam.level.slug,
+        'month_number': exam.month.number,
+        'is_completed': exam.is_completed,
+        'elapsed': int((timezone.now() - exam.started_at).total_seconds()),
+        'answers': answers,
+    })
+
+
 def certificate_view(request, session_id):
     exam = get_object_or_404(ExamSession, session_id=session_id, is_completed=True)
     answers = exam.answers.select_related('question', 'question__category').order_by(
@@ -446,7 +327,7 @@ def certificate_view(request, session_id):
             if ans.is_correct:
                 categories_data[cat]['correct'] += 1
 
-    settings_obj = SiteSettings.load()
+    settings_obj = site_settings()
     logo_url = settings_obj.logo.url if settings_obj.logo else '/static/images/logo.png'
     stamp_url = settings_obj.certificate_stamp.url if settings_obj.certificate_stamp else None
 
@@ -495,13 +376,46 @@ def certificate_view(request, session_id):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@versioned(SETTINGS_VERSION_KEY)
 def get_site_settings(request):
-    settings_obj = SiteSettings.load()
-    data = {
-        'site_name': settings_obj.site_name,
-        'tagline': settings_obj.tagline,
-        'logo_url': settings_obj.logo.url if settings_obj.logo else None,
-        'hero_image_url': settings_obj.hero_image.url if settings_obj.hero_image else None,
-    }
-    return JsonResponse({'success': True, **data})
+    return JsonResponse({'success': True, **settings_data()})
 
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def bootstrap(request):
+    """
+    Settings, catalogue and (with ?level=<slug>&month=<n>) the exam payload in
+    one response, so the app does not wait on a chain of requests.
+    """
+    level_slug = request.GET.get('level')
+    try:
+        month_number = int(request.GET['month']) if level_slug else None
+    except (KeyError, ValueError):
+        return JsonResponse({'success': False, 'error': 'month must be a number'}, status=400)
+
+    body, etag = bootstrap_payload(level_slug, month_number)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@require_http_methods(["GET"])
+def performance_reports(request):
+    """
+    Teacher performance report as JSON for staff users; takes the query
+    parameters of the admin panel report page (group, teacher, level, month).
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Staff only'}, status=403)
+    params = report_params(request.GET)
+    categories, rows = report_for(params)
+    return JsonResponse({
+        'success': True,
+        'group': params['group'],
+        'categories': [{'id': c.pk, 'name': c.name, 'slug': c.slug} for c in categories],
+        'rows': rows,
+    })
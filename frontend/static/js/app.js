@@ -11,7 +11,12 @@ let qi = 0, sec = 0, clock = null;
 let completedSections = new Set();
 let reviewData = null;
 let lastSessionId = null;
+let examSessionId = null; // in-progress ExamSession that answers autosave to
+let dirty = new Set();    // answers changed since the last autosave
+let autosaveTimer = null, autosaving = null;
+const AUTOSAVE_DELAY = 2000;
 let currentLang = localStorage.getItem('fe_lang') || '';
+let catalogue = null; // settings, levels and months from /bootstrap/
 
 const LANG_FLAGS = { uz: '🇺🇿', ru: '🇷🇺', en: '🇬🇧' };
 const LANG_NAMES = { uz: "O'zbek", ru: 'Русский', en: 'English' };
@@ -348,7 +353,18 @@ document.addEventListener('DOMContentLoaded', () => {
   if (langOverlay) hide(langOverlay);
 
   initLangSwitchers();
-  loadState();
+  const resumeId = new URLSearchParams(location.search).get('exam');
+  if (resumeId && resumeId !== savedExamSessionId()) {
+    // Opened on another device: continue from the answers saved on the server
+    resumeExam(resumeId).then(ok => {
+      if (!ok) {
+        history.replaceState(null, '', location.pathname);
+        loadState();
+      }
+    });
+  } else {
+    loadState();
+  }
 
   const inps = ['inp-first', 'inp-last', 'inp-tfirst', 'inp-tlast'].map(id => $(id));
   const checkForm = () => {
@@ -370,7 +386,7 @@ document.addEventListener('DOMContentLoaded', () => {
   $('btn-nav-restart').addEventListener('click', () => {
     if (confirm(UI[currentLang].nav_restart_desc)) {
       localStorage.removeItem('fe_state');
-      location.reload();
+      location.replace(location.pathname);
     }
   });
 
@@ -382,7 +398,7 @@ document.addEventListener('DOMContentLoaded', () => {
       swap('v-levels');
     } else if (activeScene === 'v-levels') {
       localStorage.removeItem('fe_state');
-      location.reload();
+      location.replace(location.pathname);
     }
     hide($('v-nav-modal'));
     saveState();
@@ -432,7 +448,10 @@ function saveState() {
     qi,
     sec,
     cats,
-    completedSections: Array.from(completedSections || [])
+    completedSections: Array.from(completedSections || []),
+    studentId,
+    examSessionId,
+    dirty: Array.from(dirty)
   };
   localStorage.setItem('fe_state', JSON.stringify(state));
 }
@@ -443,10 +462,17 @@ function startTimer() {
     sec++;
     $('timer-t').textContent =
       `${String(Math.floor(sec / 60)).padStart(2, '0')}:${String(sec % 60).padStart(2, '0')}`;
-    saveState(); // Save time progress
   }, 1000);
 }
 
+function savedExamSessionId() {
+  try {
+    return JSON.parse(localStorage.getItem('fe_state') || '{}').examSessionId || null;
+  } catch {
+    return null;
+  }
+}
+
 async function loadState() {
   const saved = localStorage.getItem('fe_state');
   if (!saved) {
@@ -466,6 +492,9 @@ async function loadState() {
     sec = s.sec || 0;
     cats = s.cats || [];
     completedSections = new Set(s.completedSections || []);
+    studentId = s.studentId || null;
+    examSessionId = s.examSessionId || null;
+    dirty = new Set(s.dirty || []);
 
     updateUI();
     updateLangSwitchers();
@@ -475,6 +504,8 @@ async function loadState() {
       buildDots();
       go(qi);
       startTimer();
+      if (examSessionId) history.replaceState(null, '', `?exam=${examSessionId}`);
+      scheduleAutosave();
     } else if (s.scene === 'v-months' && currentLevel) {
       // Re-fetch months to ensure data is fresh
       await loadMonths(currentLevel);
@@ -498,6 +529,38 @@ document.addEventListener('DOMContentLoaded', () => {
   if (mc) mc.addEventListener('click', () => hide($('review-modal')));
 });
 
+/* ═══ Bootstrap ═══ */
+// One request for settings, levels and months, started while the student
+// fills in the form; the level and month screens then need no round trip.
+const catalogueReady = loadCatalogue();
+
+async function loadCatalogue() {
+  try {
+    const r = await (await fetch(`${API}/bootstrap/`)).json();
+    if (!r.success) return null;
+    catalogue = r;
+    applySiteSettings(r.settings);
+    return r;
+  } catch {
+    return null;
+  }
+}
+
+function applySiteSettings(s) {
+  if (s.hero_image_url) {
+    const el = document.querySelector('.register-left');
+    if (el) {
+      el.style.backgroundImage = 'url(' + s.hero_image_url + ')';
+      el.style.backgroundSize = 'cover';
+      el.style.backgroundPosition = 'center';
+    }
+  }
+  if (s.logo_url) {
+    const logo = document.querySelector('.logo-img');
+    if (logo) logo.src = s.logo_url;
+  }
+}
+
 /* ═══ 1. Register ═══ */
 async function doRegister() {
   const body = {
@@ -538,7 +601,7 @@ async function doRegister() {
 /* ═══ 2. Levels ═══ */
 async function loadLevels() {
   try {
-    const r = await (await fetch(`${API}/levels/`)).json();
+    const r = (await catalogueReady) || await (await fetch(`${API}/levels/`)).json();
     levels = r.levels || [];
     renderLevels();
     swap('v-levels');
@@ -581,7 +644,11 @@ function renderLevels() {
 async function loadMonths(level) {
   currentLevel = level;
   try {
-    const r = await (await fetch(`${API}/levels/${level.slug}/months/`)).json();
+    await catalogueReady;
+    const info = catalogue && catalogue.levels.find(lv => lv.slug === level.slug);
+    const r = info
+      ? { success: true, level: info, months: catalogue.months[level.slug] || [] }
+      : await (await fetch(`${API}/levels/${level.slug}/months/`)).json();
     if (!r.success) { alert(UI[currentLang].months_error); return; }
     months = r.months || [];
     currentLevelInfo = r.level;
@@ -637,21 +704,136 @@ async function startExam(month) {
     sec = 0;
     completedSections = new Set();
     reviewData = null;
+    examSessionId = null;
+    dirty = new Set();
 
-    swap('v-exam');
-    const monthLabel = localizeText(month.name) || `${month.number}-${UI[currentLang].month_label}`;
-    $('exam-badge').textContent = `${currentLevel.name} — ${monthLabel}`;
-    $('user-lbl').textContent = studentName;
-    buildDots();
-    go(0);
-
-    startTimer();
+    showExam(month, 0);
     saveState();
+    startExamSession();
   } catch {
     alert(UI[currentLang].questions_error);
   }
 }
 
+function showExam(month, i) {
+  swap('v-exam');
+  const monthLabel = localizeText(month.name) || `${month.number}-${UI[currentLang].month_label}`;
+  $('exam-badge').textContent = `${currentLevel.name} — ${monthLabel}`;
+  $('user-lbl').textContent = studentName;
+  buildDots();
+  go(i);
+  startTimer();
+}
+
+/* ═══ Autosave ═══ */
+// The exam lives on the server from the start; only answers changed since
+// the last save are sent, a couple of seconds after typing stops.
+async function startExamSession() {
+  if (!studentId) return; // Submit falls back to sending every answer
+  try {
+    const r = await (await fetch(`${API}/exam/start/`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        student_id: studentId,
+        level_slug: currentLevel.slug,
+        month_number: currentMonth.number,
+      }),
+    })).json();
+    if (!r.success) return;
+    examSessionId = r.session_id;
+    // The address now resumes this exam on any device
+    history.replaceState(null, '', `?exam=${examSessionId}`);
+    saveState();
+    scheduleAutosave();
+  } catch { }
+}
+
+function answerChanged(k) {
+  dirty.add(k);
+  scheduleAutosave();
+}
+
+function scheduleAutosave() {
+  clearTimeout(autosaveTimer);
+  autosaveTimer = setTimeout(flushAnswers, AUTOSAVE_DELAY);
+}
+
+function dirtyAnswers(keys) {
+  const out = {};
+  keys.forEach(k => { if (ans[k] !== undefined) out[k] = ans[k]; });
+  return out;
+}
+
+async function flushAnswers() {
+  saveState();
+  if (!examSessionId || !dirty.size) return;
+  if (autosaving) { scheduleAutosave(); return; }
+  const sent = dirtyAnswers([...dirty]);
+  autosaving = fetch(`${API}/exam/${examSessionId}/answers/`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ answers: sent }),
+  }).then(resp => {
+    if (!resp.ok) throw new Error(resp.status);
+    // Keep answers edited while the request was in flight
+    Object.keys(sent).forEach(k => { if (ans[k] === sent[k]) dirty.delete(k); });
+    saveState();
+  }).catch(() => {
+    setTimeout(scheduleAutosave, AUTOSAVE_DELAY * 5);
+  }).finally(() => {
+    autosaving = null;
+  });
+  await autosaving;
+}
+
+function flushOnLeave() {
+  if (!qs.length || document.querySelector('.scene.active')?.id !== 'v-exam') return;
+  saveState();
+  if (examSessionId && dirty.size && navigator.sendBeacon) {
+    navigator.sendBeacon(
+      `${API}/exam/${examSessionId}/answers/`,
+      JSON.stringify({ answers: dirtyAnswers([...dirty]) })
+    );
+  }
+}
+window.addEventListener('pagehide', flushOnLeave);
+document.addEventListener('visibilitychange', () => {
+  if (document.visibilityState === 'hidden') flushOnLeave();
+});
+
+async function resumeExam(sessionId) {
+  try {
+    const p = await (await fetch(`${API}/exam/${sessionId}/`)).json();
+    if (!p.success || p.is_completed) return false;
+    const r = await (await fetch(
+      `${API}/bootstrap/?level=${encodeURIComponent(p.level_slug)}&month=${p.month_number}`
+    )).json();
+    if (!r.success || !r.exam) return false;
+    catalogue = r;
+    currentLevel = r.levels.find(lv => lv.slug === p.level_slug);
+    currentMonth = (r.months[p.level_slug] || []).find(m => m.number === p.month_number);
+    if (!currentLevel || !currentMonth) return false;
+    studentId = p.student_id;
+    studentName = p.student_name;
+    examSessionId = sessionId;
+    cats = r.exam.categories || [];
+    qs = r.exam.questions;
+    ans = p.answers;
+    dirty = new Set();
+    qi = 0;
+    sec = p.elapsed;
+    completedSections = new Set();
+    updateUI();
+    updateLangSwitchers();
+    showExam(currentMonth, 0);
+    saveState();
+    return true;
+  } catch {
+    return false;
+  }
+}
+
 /* ═══ Dots ═══ */
 function buildDots() {
   const w = $('dots-bar');
@@ -832,7 +1014,7 @@ function makeOpts(q, k) {
       el.classList.add('picked');
       el.querySelector('input').checked = true;
       syncDots();
-      saveState();
+      answerChanged(k);
     });
     d.appendChild(el);
   });
@@ -858,11 +1040,11 @@ function makeTa(k, rows, ph, big) {
     const wc = $('wc');
     if (wc) wc.textContent = countW(ta.value);
     syncDots();
-    saveState();
+    answerChanged(k);
 
     clearTimeout(aiCheckTimer);
     if (ta.value.trim().length > 40) {
-      aiCheckTimer = setTimeout(() => runAiCheck(ta.value, aiTag), 800);
+      aiCheckTimer = setTimeout(() => runAiCheck(k, ta.value, aiTag), 800);
     } else {
       aiTag.hidden = true;
     }
@@ -873,24 +1055,73 @@ function makeTa(k, rows, ph, big) {
   return wrap;
 }
 
-async function runAiCheck(text, tag) {
-  try {
-    const r = await (await fetch(`${API}/check-ai/`, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ text }),
-    })).json();
-    if (r.success && r.score > 0) {
-      tag.hidden = false;
-      const cls = r.score >= 70 ? 'ai-high' : r.score >= 40 ? 'ai-mid' : 'ai-low';
-      tag.className = `ai-indicator ${cls}`;
-      tag.innerHTML = `<span class="ai-icon">${r.score >= 40 ? '&#9888;' : '&#10003;'}</span>
-        <span>${r.label} (${r.score}%)</span>
-        ${r.reasons.length ? '<span class="ai-detail">' + r.reasons.join(', ') + '</span>' : ''}`;
-    } else {
-      tag.hidden = true;
-    }
-  } catch { tag.hidden = true; }
+/* Live AI check: only the span changed since the last check is sent;
+   the server keeps the rest of the draft (see /api/check-ai/draft/). */
+const aiDrafts = {};
+let aiCheckQueue = Promise.resolve();
+
+function textDelta(prev, next) {
+  // Code points, not UTF-16 units, so indexes match Python's str
+  const a = Array.from(prev), b = Array.from(next);
+  const max = Math.min(a.length, b.length);
+  let start = 0;
+  while (start < max && a[start] === b[start]) start++;
+  let tail = 0;
+  while (tail < max - start && a[a.length - 1 - tail] === b[b.length - 1 - tail]) tail++;
+  return { start, end: a.length - tail, text: b.slice(start, b.length - tail).join('') };
+}
+
+async function postAiDraft(body) {
+  const resp = await fetch(`${API}/check-ai/draft/`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body),
+  });
+  return resp.json();
+}
+
+async function checkAiDraft(k, text) {
+  let d = aiDrafts[k];
+  if (!d) {
+    d = aiDrafts[k] = {
+      id: `${studentId || 'anon'}-${k}-${Date.now().toString(36)}${Math.random().toString(36).slice(2, 10)}`,
+      rev: null, text: '',
+    };
+  }
+  let r = null;
+  if (d.rev !== null) {
+    r = await postAiDraft({ draft_id: d.id, rev: d.rev, ...textDelta(d.text, text) });
+  }
+  if (!r || r.resync) {
+    r = await postAiDraft({ draft_id: d.id, text });
+  }
+  if (r.success) {
+    d.rev = r.rev;
+    d.text = text;
+  } else {
+    d.rev = null;
+  }
+  return r;
+}
+
+function runAiCheck(k, text, tag) {
+  // Serialised so each delta is based on the revision the server acknowledged
+  aiCheckQueue = aiCheckQueue.then(async () => {
+    try {
+      const r = await checkAiDraft(k, text);
+      if (r.success && r.score > 0) {
+        tag.hidden = false;
+        const cls = r.score >= 70 ? 'ai-high' : r.score >= 40 ? 'ai-mid' : 'ai-low';
+        tag.className = `ai-indicator ${cls}`;
+        tag.innerHTML = `<span class="ai-icon">${r.score >= 40 ? '&#9888;' : '&#10003;'}</span>
+          <span>${r.label} (${r.score}%)</span>
+          ${r.reasons.length ? '<span class="ai-detail">' + r.reasons.join(', ') + '</span>' : ''}`;
+      } else {
+        tag.hidden = true;
+      }
+    } catch { tag.hidden = true; }
+  });
+  return aiCheckQueue;
 }
 
 function countW(t) { return t.trim().split(/\s+/).filter(w => w).length; }
@@ -901,18 +1132,27 @@ async function submitExam() {
   $('nav-submit').disabled = true;
   $('nav-submit').textContent = UI[currentLang].submitting;
   try {
-    const r = await (await fetch(`${API}/submit-exam/`, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({
+    clearTimeout(autosaveTimer);
+    if (autosaving) await autosaving;
+    // With a server-side exam only the answers not autosaved yet are sent
+    const body = examSessionId
+      ? { session_id: examSessionId, answers: dirtyAnswers([...dirty]) }
+      : {
         student_id: studentId,
         level_slug: currentLevel.slug,
         month_number: currentMonth.number,
         answers: ans,
-      }),
+      };
+    const r = await (await fetch(`${API}/submit-exam/`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body),
     })).json();
     if (r.success) {
       clearInterval(clock);
+      examSessionId = null;
+      dirty = new Set();
+      history.replaceState(null, '', location.pathname);
       reviewData = r.review || [];
       lastSessionId = r.session_id || null;
 
@@ -14,7 +14,15 @@ exports.handler = async (event) => {
 
   const path = event.queryStringParameters?.path || '';
   const apiPath = path ? `/api/${path}` : '/api/';
-  const url = `${backend.replace(/\/$/, '')}${apiPath}`;
+  // The rewrite adds `path`; every other query parameter goes on to Django
+  const params = new URLSearchParams();
+  const query = event.multiValueQueryStringParameters
+    || Object.fromEntries(Object.entries(event.queryStringParameters || {}).map(([k, v]) => [k, [v]]));
+  for (const [key, values] of Object.entries(query)) {
+    if (key !== 'path') values.forEach((v) => params.append(key, v));
+  }
+  const search = params.toString();
+  const url = `${backend.replace(/\/$/, '')}${apiPath}${search ? `?${search}` : ''}`;
 
   const headers = { ...event.headers };
   delete headers['host'];